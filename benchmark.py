@@ -0,0 +1,188 @@
+#---------------------------------------------
+# Move Generation Benchmarks for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import numpy as np
+import random as r
+import state as s
+import position as po
+import time as t
+import tracemalloc
+import argparse
+import json
+import sys
+
+# Times the hot paths of pieces.py and state.py over a fixed, seeded corpus of positions
+# and reports operations per second and bytes allocated per call. Results can be written
+# to JSON and compared against a stored baseline to flag regressions.
+
+
+def build_corpus(size, seed):
+    """Generating a reproducible set of positions"""
+
+    # Args: (1) number of positions, (2) seed
+    # Returns: list of (piece list, player to move)
+
+    r.seed(seed)
+    corpus = []
+    while len(corpus) < size:
+        pieces = s.initialize_pieces(random=True, keep_prob=r.uniform(0.3, 1.0))
+        player = 'white' if r.randint(0, 1) == 1 else 'black'
+
+        # Play a few random moves so the corpus also holds kings and captures
+        for ply in range(0, r.randint(0, 20)):
+            legal = np.argwhere(s.action_space(pieces, player) == 1)
+            if len(legal) == 0:
+                break
+            i, j = legal[r.randrange(len(legal))]
+            offset = 0 if player == 'white' else 12
+            pieces[i + offset].move(j, pieces)
+            player = 'black' if player == 'white' else 'white'
+
+        corpus.append((pieces, player))
+
+    return corpus
+
+
+def move_calls(corpus):
+    """Building move-and-take-back calls for every legal move in the corpus"""
+
+    # Args: (1) corpus
+    # Returns: list of zero-argument callables
+    calls = []
+    for pieces, player in corpus:
+        offset = 0 if player == 'white' else 12
+        for i, j in np.argwhere(s.action_space(pieces, player) == 1):
+            piece = pieces[i + offset]
+            calls.append(lambda piece=piece, j=j, pieces=pieces: piece.unmake(piece.move(j, pieces)))
+    return calls
+
+
+def benchmarks(corpus):
+    """Listing the benchmarked operations"""
+
+    # Args: (1) corpus
+    # Returns: list of (name, list of zero-argument callables)
+    pieces_in_corpus = [(piece, pieces) for pieces, player in corpus for piece in pieces if piece.is_active]
+    positions = [po.from_pieces(pieces, player) for pieces, player in corpus]
+    return [
+        ('Piece.actions', [lambda piece=piece, pieces=pieces: piece.actions(pieces)
+                           for piece, pieces in pieces_in_corpus]),
+        ('Piece.move+unmake', move_calls(corpus)),
+        ('state.action_space', [lambda pieces=pieces, player=player: s.action_space(pieces, player)
+                                for pieces, player in corpus]),
+        ('state.action_space[bitboard]', [lambda pieces=pieces, player=player: s.action_space(pieces, player, engine='bitboard')
+                                          for pieces, player in corpus]),
+        ('state.action_space[position]', [lambda pieces=pieces, player=player: s.action_space(pieces, player, engine='position')
+                                          for pieces, player in corpus]),
+        ('position.action_space', [lambda position=position: po.action_space(position) for position in positions]),
+        ('Position.copy', [position.copy for position in positions]),
+        ('state.board_state', [lambda pieces=pieces: s.board_state(pieces) for pieces, player in corpus]),
+        ('state.points', [lambda pieces=pieces: s.points(pieces) for pieces, player in corpus]),
+        ('state.initialize_pieces', [lambda: s.initialize_pieces(random=True, keep_prob=0.8)
+                                     for k in range(0, len(corpus))]),
+    ]
+
+
+def measure(calls, repeat):
+    """Timing a list of calls and measuring their allocations"""
+
+    # Args: (1) zero-argument callables, (2) passes over the list
+    # Returns: (1) calls per second in the fastest pass, (2) mean bytes allocated per call
+
+    # Timing (tracing disabled, since it slows allocation down); the fastest pass is
+    # the least disturbed by other load on the machine
+    fastest = None
+    for k in range(0, repeat):
+        start = t.perf_counter()
+        for call in calls:
+            call()
+        elapsed = t.perf_counter() - start
+        fastest = elapsed if fastest is None else min(fastest, elapsed)
+    ops_per_sec = len(calls) / fastest
+
+    # Allocations: peak traced memory above the starting level during each call
+    tracemalloc.start()
+    allocated = 0
+    for call in calls:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        call()
+        allocated += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    return ops_per_sec, allocated / len(calls)
+
+
+def run(size, seed, repeat):
+    """Running every benchmark"""
+
+    # Args: (1) corpus size, (2) seed, (3) timing passes
+    # Returns: results dictionary
+    corpus = build_corpus(size, seed)
+    results = {}
+    for name, calls in benchmarks(corpus):
+        # Seed again so randomized operations see the same draws in every run
+        r.seed(seed)
+        ops_per_sec, alloc_bytes = measure(calls, repeat)
+        results[name] = {'ops_per_sec': ops_per_sec, 'alloc_bytes_per_call': alloc_bytes, 'calls': len(calls)}
+        print("%-30s %12.0f ops/sec %10.0f bytes/call" % (name, ops_per_sec, alloc_bytes))
+
+    return {'seed': seed, 'corpus': size, 'repeat': repeat, 'results': results}
+
+
+def compare(results, baseline, tolerance):
+    """Flagging operations slower than the baseline"""
+
+    # Args: (1) results, (2) baseline results, (3) allowed fractional slowdown
+    # Returns: list of regressed operation names
+    regressions = []
+    print("\n%-30s %12s %12s %8s" % ('Operation', 'Baseline', 'Current', 'Ratio'))
+    for name, current in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        reference = baseline['results'][name]['ops_per_sec']
+        ratio = current['ops_per_sec'] / reference
+        flag = ''
+        if ratio < 1 - tolerance:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print("%-30s %12.0f %12.0f %8.2f%s" % (name, reference, current['ops_per_sec'], ratio, flag))
+
+    return regressions
+
+
+if __name__ == "__main__":
+
+    # ----------------------------------------------------
+    # Parsing Console Arguments
+    # ----------------------------------------------------
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--corpus", help="Number of positions (Default 200)", type=int)
+    parser.add_argument("-s", "--seed", help="Corpus seed (Default 0)", type=int)
+    parser.add_argument("-r", "--repeat", help="Timing passes over the corpus (Default 5)", type=int)
+    parser.add_argument("-o", "--output", help="Write results to this JSON file", type=str)
+    parser.add_argument("-b", "--baseline", help="Compare against this JSON file", type=str)
+    parser.add_argument("-t", "--tolerance", help="Allowed slowdown before flagging (Default 0.1)", type=float)
+    args = parser.parse_args()
+
+    size = args.corpus if args.corpus else 200
+    seed = args.seed if args.seed else 0
+    repeat = args.repeat if args.repeat else 5
+    tolerance = args.tolerance if args.tolerance else 0.1
+
+    results = run(size, seed, repeat)
+
+    if args.output:
+        with open(args.output, 'w') as file_object:
+            json.dump(results, file_object, indent=2)
+
+    # Exit with an error if any operation regressed against the baseline
+    if args.baseline:
+        with open(args.baseline) as file_object:
+            baseline = json.load(file_object)
+        if compare(results, baseline, tolerance):
+            sys.exit(1)
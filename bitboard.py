@@ -0,0 +1,119 @@
+#---------------------------------------------
+# Bitboard Move Generation for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import numpy as np
+import squares as sq
+
+# Bit n of a bitboard is playable square n (see squares.py for square numbering).
+# A position is held as three 32-bit integers: white occupancy, black occupancy and kings.
+
+FULL = 0xFFFFFFFF           # All 32 squares
+ODD_RANKS = 0x0F0F0F0F      # Ranks 1, 3, 5, 7 (squares on files a, c, e, g)
+EVEN_RANKS = 0xF0F0F0F0     # Ranks 2, 4, 6, 8 (squares on files b, d, f, h)
+FILE_A = 0x01010101         # Left edge (only reachable on odd ranks)
+FILE_H = 0x80808080         # Right edge (only reachable on even ranks)
+
+
+def from_pieces(piece_list):
+    """Building occupancy bitboards from a piece list"""
+
+    # Args: (1) piece list
+    # Returns: (1) white bitboard, (2) black bitboard, (3) kings bitboard
+
+    white = 0
+    black = 0
+    kings = 0
+    for piece in piece_list:
+        if piece.is_active:
+            bit = 1 << sq.square_index(piece.file, piece.rank)
+            if piece.color == 'white':
+                white |= bit
+            else:
+                black |= bit
+            if piece.name == 'King':
+                kings |= bit
+
+    return white, black, kings
+
+
+# Shifting every square of a bitboard one step along a diagonal.
+# Squares that would leave the board are dropped.
+
+def up_left(board):
+    return (((board & EVEN_RANKS) << 4) | ((board & ODD_RANKS & ~FILE_A) << 3)) & FULL
+
+
+def up_right(board):
+    return (((board & ODD_RANKS) << 4) | ((board & EVEN_RANKS & ~FILE_H) << 5)) & FULL
+
+
+def down_left(board):
+    return ((board & EVEN_RANKS) >> 4) | ((board & ODD_RANKS & ~FILE_A) >> 5)
+
+
+def down_right(board):
+    return ((board & ODD_RANKS) >> 4) | ((board & EVEN_RANKS & ~FILE_H) >> 3)
+
+
+# Shift for each direction of squares.DIRECTIONS paired with its inverse (the shift that steps back)
+SHIFTS = [(up_left, down_right),
+          (up_right, down_left),
+          (down_left, up_right),
+          (down_right, up_left)]
+
+
+def move_sets(own, opponents, empty):
+    """Finding which squares can step or jump in each direction"""
+
+    # Args: (1) bitboard of pieces to move, (2) opponent bitboard, (3) empty bitboard
+    # Returns: dictionary of (direction, jump?) -> bitboard of squares able to make that move
+
+    # A piece can step if the square ahead is empty, and jump if the square
+    # ahead holds an opponent and the square beyond that is empty.
+    result = {}
+    for direction, (step, back) in enumerate(SHIFTS):
+        result[(direction, False)] = own & back(empty)
+        result[(direction, True)] = own & back(opponents & back(empty))
+
+    return result
+
+
+def action_space(piece_list, player):
+    """Determining available moves for evaluation from bitboards"""
+
+    # Args: (1) piece list, (2) player color
+    # Returns: 12 x 8 action space identical to state.action_space
+
+    white, black, kings = from_pieces(piece_list)
+    empty = ~(white | black) & FULL
+    if player == 'white':
+        own, opponents, offset = white, black, 0
+    else:
+        own, opponents, offset = black, white, 12
+
+    men_moves = move_sets(own & ~kings, opponents, empty)
+    king_moves = move_sets(own & kings, opponents, empty)
+
+    # Initializing action space with dimensions P x 8
+    action_space = np.zeros((12, 8))
+
+    # Write each piece's row from the bits of its square
+    for i in range(0, 12):
+        piece = piece_list[i + offset]
+        if not piece.is_active:
+            continue
+        square = sq.square_index(piece.file, piece.rank)
+        if piece.name == 'King':
+            slots, moves = sq.KING_SLOTS, king_moves
+        else:
+            slots, moves = sq.MAN_SLOTS[player], men_moves
+        for j, slot in enumerate(slots):
+            if (moves[slot] >> square) & 1:
+                action_space[i, j] = 1
+
+    # Return action space
+    return action_space
@@ -0,0 +1,214 @@
+#---------------------------------------------
+# Background Checkpointing for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import tensorflow as tf
+import inference as nf
+import threading
+import queue
+import time as t
+import glob
+import os
+
+# The training thread only copies variable values out of its session (an in-memory
+# sess.run) and hands them to a writer thread. The writer loads them into its own graph
+# and session and saves them to <save_path>-<step>. Files are first written under a
+# temporary prefix and renamed, and the checkpoint state file is updated last, so a
+# reader never sees a half-written checkpoint. Only the newest `keep` checkpoints are kept,
+# counting those a previous run listed in the state file.
+# An error in the writer thread stops it and is raised again by the next save() or close().
+
+
+def resolve(load_path):
+    """Finding the checkpoint to restore from a path given on the command line"""
+
+    # Args: (1) checkpoint (e.g. checkpoints/model-500) or save path (e.g. checkpoints/model)
+    # Returns: load_path if it names a checkpoint, else the newest versioned checkpoint
+    #          in its directory, or load_path if there is none
+    if tf.train.checkpoint_exists(load_path):
+        return load_path
+    latest = tf.train.latest_checkpoint(os.path.dirname(load_path) or '.')
+    return latest if latest else load_path
+
+
+def export_weights(load_path, npz_path):
+    """Writing a checkpoint's value network variables to a .npz file for inference.py"""
+
+    # Args: (1) save path (resolved as in resolve), (2) output path
+    # Returns: void
+    reader = tf.train.NewCheckpointReader(resolve(load_path))
+    nf.save([reader.get_tensor(name) for name in nf.VARIABLES], npz_path)
+
+
+class AsyncCheckpointer():
+
+    """Rate-limited checkpoint writer running in a background thread"""
+
+    def __init__(self, save_path, every_steps=1, every_seconds=0, keep=5):
+
+        # Args: (1) path prefix, (2) save at most every N steps,
+        #       (3) or at most every N seconds if nonzero, (4) number of checkpoints kept
+        self.save_path = save_path
+        self.every_steps = every_steps
+        self.every_seconds = every_seconds
+        self.keep = keep
+        self.last_step = None
+        self.last_time = t.time()
+        self.error = None   # Exception that stopped the writer thread
+
+        # The saver does not create the checkpoint directory
+        os.makedirs(os.path.dirname(save_path) or '.', exist_ok=True)
+
+        # Checkpoints listed in the state file, oldest first; retention also expires the
+        # ones written by a previous run
+        state = tf.train.get_checkpoint_state(os.path.dirname(save_path) or '.')
+        self.kept = list(state.all_model_checkpoint_paths) if state else []
+
+        # Snapshot of the training graph's variables; built on first save
+        self.variables = None
+
+        # Holds at most one pending snapshot; a newer one replaces it
+        self.pending = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def due(self, step):
+
+        """Checking whether the interval since the last save has elapsed"""
+
+        # Requires: training step
+        # Returns: True if a checkpoint should be taken
+        if self.last_step is None:
+            return True
+        if self.every_seconds:
+            return t.time() - self.last_time >= self.every_seconds
+        return step - self.last_step >= self.every_steps
+
+
+    def check(self):
+
+        """Raising the error that stopped the writer thread, if any"""
+
+        # Requires: none
+        # Returns: void
+        if self.error is not None:
+            raise self.error
+
+
+    def save(self, sess, step, force=False):
+
+        """Handing a snapshot of the variables to the writer thread"""
+
+        # Requires: (1) training session, (2) step, (3) force: ignore the interval
+        # Returns: True if a snapshot was taken
+        self.check()
+        if not (force or self.due(step)):
+            return False
+
+        if self.variables is None:
+            self.variables = tf.global_variables()
+        values = sess.run(self.variables)
+        snapshot = (step, [(v.op.name, v.dtype.base_dtype, value) for v, value in zip(self.variables, values)])
+
+        # Never wait for the writer: drop a snapshot it has not picked up yet
+        try:
+            self.pending.get_nowait()
+        except queue.Empty:
+            pass
+        self.pending.put_nowait(snapshot)
+
+        self.last_step = step
+        self.last_time = t.time()
+        return True
+
+
+    def run(self):
+
+        """Writing snapshots until close() sends None"""
+
+        graph = tf.Graph()
+        sess = None
+        try:
+            while True:
+                snapshot = self.pending.get()
+                if snapshot is None:
+                    break
+                step, values = snapshot
+
+                # Build variables with the training graph's names on the first snapshot
+                if sess is None:
+                    with graph.as_default():
+                        placeholders = []
+                        assign_ops = []
+                        var_list = {}
+                        for name, dtype, value in values:
+                            variable = tf.Variable(tf.zeros(value.shape, dtype=dtype), name=name)
+                            placeholder = tf.placeholder(dtype, value.shape)
+                            placeholders.append(placeholder)
+                            assign_ops.append(variable.assign(placeholder))
+                            var_list[name] = variable
+                        saver = tf.train.Saver(var_list=var_list)
+                    sess = tf.Session(graph=graph)
+
+                sess.run(assign_ops, feed_dict={placeholder: value for placeholder, (name, dtype, value)
+                                                in zip(placeholders, values)})
+                self.write(sess, saver, step)
+        except Exception as error:
+            # Kept for the training thread; the writer stops here
+            self.error = error
+        finally:
+            if sess is not None:
+                sess.close()
+
+
+    def write(self, sess, saver, step):
+
+        """Saving one checkpoint with atomic renames and retention"""
+
+        # Requires: (1) writer session, (2) saver, (3) step
+        # Returns: void
+        prefix = "%s-%d" % (self.save_path, step)
+        temp_prefix = prefix + ".tmp"
+        saver.save(sess, temp_prefix, write_meta_graph=False, write_state=False)
+
+        # Rename the data shards before the index so the index never names missing data
+        files = sorted(glob.glob(glob.escape(temp_prefix) + ".*"), key=lambda f: f.endswith(".index"))
+        for temp_file in files:
+            os.replace(temp_file, prefix + temp_file[len(temp_prefix):])
+
+        # Retention: keep only the newest checkpoints (a step saved again moves to the end)
+        if prefix in self.kept:
+            self.kept.remove(prefix)
+        self.kept.append(prefix)
+        expired = self.kept[:-self.keep]
+        self.kept = self.kept[-self.keep:]
+
+        # Publish the new checkpoint in the state file used by resolve(), then
+        # delete the expired ones it no longer lists
+        tf.train.update_checkpoint_state(os.path.dirname(prefix) or '.', prefix,
+                                         all_model_checkpoint_paths=self.kept)
+        for old_prefix in expired:
+            for old_file in glob.glob(glob.escape(old_prefix) + ".*"):
+                os.remove(old_file)
+
+
+    def close(self):
+
+        """Writing the last pending snapshot and stopping the writer thread"""
+
+        # Requires: none
+        # Returns: void
+        # Only wait for room in the queue while the writer is alive to make it
+        while self.thread.is_alive():
+            try:
+                self.pending.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        self.thread.join()
+        self.check()
@@ -0,0 +1,163 @@
+#---------------------------------------------
+# On-Disk Self-Play Dataset for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import numpy as np
+import packing as pk
+import json
+import os
+
+# (board state, return) pairs are appended to fixed-size shards in a directory:
+#   states-00000.npy   shard_size x 2 uint32 bit-packed board states (see packing.py),
+#                      or shard_size x 128 uint8 board states for unpacked datasets
+#   returns-00000.npy  shard_size float32 returns
+#   index.json         shard size, state size, packed flag and the number of valid rows per shard
+# Shards are preallocated .npy files opened with np.memmap, so only the rows that are
+# touched are read into memory. Rows are flushed before the index counts them, and the
+# index is replaced atomically, so a reader (another process, or the learner after a
+# restart) only ever sees complete rows. Readers pick up new rows with refresh().
+
+INDEX = 'index.json'
+
+
+class ShardedDataset():
+
+    """Appendable dataset of memory-mapped .npy shards"""
+
+    def __init__(self, directory, shard_size=1000000, state_size=128, packed=True):
+
+        # Args: (1) dataset directory (created if missing; existing data is kept),
+        #       (2) rows per shard for a new dataset, (3) flattened board state size,
+        #       (4) store states bit-packed in a new dataset?
+        self.directory = directory
+        self.shard_size = shard_size
+        self.state_size = state_size
+        self.packed = packed
+        self.counts = []    # Valid rows per shard
+        self.states = []    # Memory-mapped shards, opened on first use
+        self.returns = []
+        os.makedirs(directory, exist_ok=True)
+        self.refresh()
+
+
+    def __len__(self):
+        return sum(self.counts)
+
+
+    def path(self, name, shard):
+        return os.path.join(self.directory, "%s-%05d.npy" % (name, shard))
+
+
+    def refresh(self):
+
+        """Reloading the index to see rows appended by a writer"""
+
+        # Requires: none
+        # Returns: void
+        index_path = os.path.join(self.directory, INDEX)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path) as file_object:
+            index = json.load(file_object)
+        self.shard_size = index['shard_size']
+        self.state_size = index['state_size']
+        self.packed = index.get('packed', False)
+        self.counts = index['counts']
+        while len(self.states) < len(self.counts):
+            self.states.append(None)
+            self.returns.append(None)
+
+
+    def open(self, shard, mode='r'):
+
+        """Memory-mapping a shard"""
+
+        # Requires: (1) shard number, (2) 'r' to read or 'r+' to write
+        # Returns: void
+        if self.states[shard] is None or (mode == 'r+' and self.states[shard].mode != 'r+'):
+            self.states[shard] = np.load(self.path('states', shard), mmap_mode=mode)
+            self.returns[shard] = np.load(self.path('returns', shard), mmap_mode=mode)
+
+
+    def write_index(self):
+
+        """Replacing the index file atomically"""
+
+        index = {'shard_size': self.shard_size, 'state_size': self.state_size, 'packed': self.packed,
+                 'counts': self.counts}
+        index_path = os.path.join(self.directory, INDEX)
+        with open(index_path + '.tmp', 'w') as file_object:
+            json.dump(index, file_object)
+        os.replace(index_path + '.tmp', index_path)
+
+
+    def add(self, states, returns):
+
+        """Appending a batch of pairs"""
+
+        # Requires: (1) board states (any shape with N * state_size entries), (2) N returns
+        # Returns: void
+        states = np.reshape(states, (len(returns), self.state_size))
+        returns = np.asarray(returns)
+        if self.packed:
+            states = pk.pack_states(states)
+
+        written = 0
+        while written < len(returns):
+
+            # Start a new preallocated shard when the last one is full
+            if not self.counts or self.counts[-1] == self.shard_size:
+                shard = len(self.counts)
+                np.lib.format.open_memmap(self.path('states', shard), mode='w+',
+                                          dtype=np.uint32 if self.packed else np.uint8,
+                                          shape=(self.shard_size, states.shape[1])).flush()
+                np.lib.format.open_memmap(self.path('returns', shard), mode='w+', dtype=np.float32,
+                                          shape=(self.shard_size,)).flush()
+                self.counts.append(0)
+                self.states.append(None)
+                self.returns.append(None)
+
+            shard = len(self.counts) - 1
+            self.open(shard, mode='r+')
+            start = self.counts[shard]
+            rows = min(self.shard_size - start, len(returns) - written)
+            self.states[shard][start:start + rows] = states[written:written + rows]
+            self.returns[shard][start:start + rows] = returns[written:written + rows]
+            self.states[shard].flush()
+            self.returns[shard].flush()
+
+            self.counts[shard] += rows
+            written += rows
+
+        # Publish the new rows
+        self.write_index()
+
+
+    def sample(self, batch_size, unpack=True):
+
+        """Sampling a minibatch uniformly across all shards"""
+
+        # Requires: (1) batch size, (2) expand packed states? (False returns the stored rows)
+        # Returns: (1) batch_size x state_size float32 board states, (2) batch_size returns
+        offsets = np.cumsum([0] + self.counts)
+        rows = np.sort(np.random.randint(0, offsets[-1], size=batch_size))
+        shards = np.searchsorted(offsets, rows, side='right') - 1
+
+        states = np.zeros((batch_size, 2 if self.packed else self.state_size),
+                          dtype=np.uint32 if self.packed else np.float32)
+        returns = np.zeros(batch_size, dtype=np.float32)
+        for shard in np.unique(shards):
+            self.open(shard)
+            selected = np.flatnonzero(shards == shard)
+            # Sorted row numbers keep the reads within each shard sequential
+            states[selected] = self.states[shard][rows[selected] - offsets[shard]]
+            returns[selected] = self.returns[shard][rows[selected] - offsets[shard]]
+
+        # Undo the sort so the batch is in random order
+        order = np.random.permutation(batch_size)
+        if self.packed and unpack:
+            return pk.unpack_states(states[order]), returns[order]
+        return states[order], returns[order]
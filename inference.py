@@ -0,0 +1,95 @@
+#---------------------------------------------
+# NumPy Inference for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import numpy as np
+import argparse
+
+# Forward pass of the value network (main.build_value_network: 128 -> hidden -> hidden -> 1,
+# ReLU hidden layers and a linear output) in NumPy. Playing games only needs this forward
+# pass, so a player holding a ValueNetwork skips building a TensorFlow graph and session
+# and pays no per-call session overhead. This module does not import TensorFlow.
+#
+# Weights are the network's trainable variables in tf.trainable_variables() order, as
+# sent to self-play workers, or a .npz file exported from a checkpoint:
+#   python inference.py -ld checkpoints/model -o checkpoints/model.npz
+
+# Checkpoint variable names in tf.trainable_variables() order
+VARIABLES = ['fully_connected/weights', 'fully_connected/biases',
+             'fully_connected_1/weights', 'fully_connected_1/biases',
+             'fully_connected_2/weights', 'fully_connected_2/biases']
+
+
+class ValueNetwork():
+
+    """Value network forward pass on NumPy arrays"""
+
+    def __init__(self, weights=None):
+
+        # Args: (1) list of trainable variable values (None to set them later)
+        self.layers = []
+        if weights is not None:
+            self.set_weights(weights)
+
+
+    def set_weights(self, weights):
+
+        """Replacing the weights"""
+
+        # Requires: list of trainable variable values ([W1, b1, W2, b2, W3, b3])
+        # Returns: void
+        weights = [np.asarray(weight, dtype=np.float32) for weight in weights]
+        self.layers = list(zip(weights[0::2], weights[1::2]))
+
+
+    def predict(self, board_states):
+
+        """Evaluating a batch of board states"""
+
+        # Requires: board states (any shape with N * 128 entries)
+        # Returns: [N, 1] float32 array of expected returns
+        activations = np.reshape(board_states, (-1, 128)).astype(np.float32)
+        for weights, biases in self.layers[:-1]:
+            activations = np.maximum(activations @ weights + biases, 0)
+        weights, biases = self.layers[-1]
+        return activations @ weights + biases
+
+
+def load(npz_path):
+    """Loading an exported network"""
+
+    # Args: (1) path of a .npz file written by export
+    # Returns: ValueNetwork
+    with np.load(npz_path) as variables:
+        return ValueNetwork([variables[name] for name in VARIABLES])
+
+
+def save(weights, npz_path):
+    """Writing trainable variable values to a .npz file"""
+
+    # Args: (1) list of trainable variable values, (2) output path
+    # Returns: void
+    np.savez(npz_path, **dict(zip(VARIABLES, weights)))
+
+
+if __name__ == "__main__":
+
+    # ----------------------------------------------------
+    # Exporting a Checkpoint
+    # ----------------------------------------------------
+    # Imported here so that loading exported weights never imports TensorFlow
+    import checkpoint as ck
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-ld", "--loaddir", help="Checkpoint to export (Default checkpoints/model)", type=str)
+    parser.add_argument("-o", "--output", help="Output .npz file (Default checkpoints/model.npz)", type=str)
+    args = parser.parse_args()
+
+    load_path = args.loaddir if args.loaddir else "checkpoints/model"
+    output = args.output if args.output else "checkpoints/model.npz"
+
+    ck.export_weights(load_path, output)
+    print("Exported %s to %s" % (ck.resolve(load_path), output))
@@ -5,17 +5,34 @@
 # Last Edited: 2021
 # University of Wisconsin - Madison
 # ----------------------------------------------------
-import tensorflow as tf
 import numpy as np
 import pieces as p
 import random as r
 import state as s
+import selfplay as sp
+import vector_engine as v
+import zobrist as z
+import replay as rp
+import dataset as ds
+import inference as nf
+import profiler as pf
+import search as sr
+import mcts as mc
+import symmetry as sym
 import time as t
 import copy as c
 import argparse
 import math
 import os
 
+# TensorFlow is imported by build_value_network and the trainer below, not at module
+# level, so self-play workers using NumPy inference (see selfplay.py) start without it
+
+# Phase timings for self-play and training; replaced by an enabled timer when profiling
+timer = pf.PhaseTimer(enabled=False)
+# NumPy copy of the value network used by predict instead of the session (None to use the session)
+network = None
+
 # ----------------------------------------------------
 # User-Defined Methods
 # ----------------------------------------------------
@@ -57,14 +74,14 @@ def visualize_board(pieces, player, move):
 def move_piece(piece, move_index, player, pieces, switch_player=False, print_move=False, algebraic=True):
     """
     Perform specified move
-    Returns: Void
+    Returns: Next player if switch_player, else undo record for unmake_move
     """
     if player == 'white':
-        pieces[piece].move(move_index, pieces,
-                           print_move=print_move, algebraic=algebraic)
+        undo = pieces[piece].move(move_index, pieces,
+                                  print_move=print_move, algebraic=algebraic)
     else:
-        pieces[piece + 12].move(move_index, pieces,
-                                print_move=print_move, algebraic=algebraic)
+        undo = pieces[piece + 12].move(move_index, pieces,
+                                       print_move=print_move, algebraic=algebraic)
 
     if switch_player:
         if player == 'white':
@@ -73,8 +90,62 @@ def move_piece(piece, move_index, player, pieces, switch_player=False, print_mov
             player = 'white'
         return player
 
+    return undo
+
+
+def unmake_move(piece, player, pieces, undo):
+    """
+    Take back a move made with move_piece
+    Returns: Void
+    """
+    if player == 'white':
+        pieces[piece].unmake(undo)
+    else:
+        pieces[piece + 12].unmake(undo)
+
+
+def predict(board_states):
+    """
+    Evaluate the value network on a batch of board states
+    Returns: [N, 1] array of expected returns
+    """
+    board_states = np.reshape(board_states, (-1, 128))
+    timer.count('inference_calls')
+    timer.count('inference_rows', len(board_states))
+    with timer.phase('inference'):
+        if network is not None:
+            return network.predict(board_states)
+        return sess.run(predictions, feed_dict={inputs: board_states})
+
+
+def predict_cached(board_states, keys, cache):
+    """
+    Evaluate the value network, reusing predictions cached by position hash
+    Returns: [N, 1] array of expected returns
+    """
+    expected_returns = np.zeros((len(keys), 1))
+
+    # Look up every position and collect the misses
+    missing = []
+    for k, key in enumerate(keys):
+        value = cache.get(key)
+        if value is None:
+            missing.append(k)
+        else:
+            expected_returns[k, 0] = value
+
+    # Evaluate the misses in a single session call and cache the results
+    if missing:
+        expected_returns[missing] = predict(board_states[missing])
+        for k in missing:
+            cache.put(keys[k], expected_returns[k, 0])
+
+    return expected_returns
 
-def generate_game(batch_size, max_moves, epsilon, visualize, print_move, algebraic):
+
+def generate_game(batch_size, max_moves, epsilon, visualize, print_move, algebraic, engine='pieces', cache=None,
+                  all_positions=False, search_depth=0, search_nodes=0, search_seconds=0, simulations=0,
+                  mcts_batch=16, c_puct=2.0, canonical=False):
     """
     Generating feature and target batches
     Returns: (1) feature batch, (2) label batch
@@ -82,6 +153,24 @@ def generate_game(batch_size, max_moves, epsilon, visualize, print_move, algebra
 
     # Generates training data based on batches of full-depth Monte-Carlo simulations
     # performing epsilon-greedy policy evalutaion.
+    # By default each game contributes its initial state and return. With all_positions,
+    # every visited state is returned with its return, for the replay buffer.
+    # With search_depth > 0, greedy moves are chosen by alpha-beta search (see search.py)
+    # instead of the one-ply lookup, and with simulations > 0 by Monte Carlo tree search
+    # (see mcts.py), which keeps its subtree from one move to the next.
+    # With canonical, states and afterstates with black to move are flipped so the network
+    # always sees the side to move as white, and their values are negated (see symmetry.py).
+
+    # The vectorized engine plays the whole batch in lockstep
+    if engine == 'vector':
+        return v.generate_game(batch_size, max_moves, epsilon, predict, all_positions=all_positions,
+                               canonical=canonical)
+
+    # Searcher for greedy moves
+    searcher = sr.Searcher(predict, max_depth=search_depth, max_nodes=search_nodes,
+                           max_seconds=search_seconds, engine=engine, canonical=canonical) if search_depth else None
+    tree = mc.MCTS(predict, simulations=simulations, batch_size=mcts_batch, c_puct=c_puct,
+                   engine=engine, canonical=canonical) if simulations else None
 
     # Initialize placeholders for batches
     feature_batches = []
@@ -100,11 +189,19 @@ def generate_game(batch_size, max_moves, epsilon, visualize, print_move, algebra
         # Create placeholders for board states and return for each state
         all_states = []
         all_returns = []
+        # Sign converting each return to the point of view its state is stored from
+        all_signs = []
 
         # Generating board parameters
         pieces, initial_state, player, move = initialize_board(
             random=True, keep_prob=0.8)
         point_diff_0 = s.points(pieces)
+        if tree is not None:
+            tree.reset()
+        # Board tensor and position hash updated in place by every move and take-back
+        board = s.attach_board(pieces)
+        if cache is not None:
+            key = z.attach_key(pieces)
 
         # ----------------------------------------------------
         # Monte Carlo Simulations
@@ -127,10 +224,11 @@ def generate_game(batch_size, max_moves, epsilon, visualize, print_move, algebra
                 break
 
             # Obtain board state
-            if move == 0:
-                board_state = initial_state
-            else:
-                board_state = s.board_state(pieces)
+            with timer.phase('copy'):
+                if move == 0:
+                    board_state = initial_state
+                else:
+                    board_state = board.copy()
 
             # Visualize board state
             if visualize:
@@ -140,8 +238,10 @@ def generate_game(batch_size, max_moves, epsilon, visualize, print_move, algebra
             net_diff = s.points(pieces) - point_diff_0
             point_diff_0 = s.points(pieces)
 
-            # Append initial board state to all_states
-            all_states.append(board_state)
+            # Append initial board state to all_states (flipped if black is to move in canonical mode)
+            flip = canonical and player == 'black'
+            all_states.append(sym.flip_states(board_state) if flip else board_state)
+            all_signs.append(-1 if flip else 1)
             # Add net_diff to all existing returns
             for i in range(0, len(all_returns)):
                 all_returns[i] += net_diff
@@ -149,7 +249,10 @@ def generate_game(batch_size, max_moves, epsilon, visualize, print_move, algebra
             all_returns.append(0)
 
             # Obtain action space
-            action_space = s.action_space(pieces, player)
+            with timer.phase('movegen'):
+                action_space = s.action_space(pieces, player, engine=engine)
+                # Obtain (piece, move) indices of every legal move
+                legal_moves = np.argwhere(action_space == 1)
 
             # ----------------------------------------------------
             # Value Function Approximation
@@ -160,72 +263,107 @@ def generate_game(batch_size, max_moves, epsilon, visualize, print_move, algebra
             # Create placeholder for expected return values
             return_array = np.zeros((12, 8))
 
-            # For each possible move...
-            for i in range(0, 12):
-                for j in range(0, 8):
-                    # If the move is legal...
-                    if action_space[i, j] == 1:
-
-                        # Perform move and obtain temporary board state
-                        # Reset temporary pieces variable
-                        temp_pieces = c.deepcopy(pieces)
-                        # Perform temporary move
-                        move_piece(i, j, player, temp_pieces)
-                        temp_board_state = s.board_state(
-                            temp_pieces)  # Obtain temporary state
-
-                        # With temporary state, calculate expected return
-                        expected_return = sess.run(predictions, feed_dict={
-                                                   inputs: np.reshape(temp_board_state, (1, 128))})
-                        # Write estimated return to return_array
-                        return_array[i, j] = expected_return
+            # In canonical mode the afterstates of white's moves have black to move,
+            # so they are evaluated (and cached) flipped and their values negated
+            flip_after = canonical and player == 'white'
+
+            # For each legal move, perform it in place, record the afterstate and take it back
+            with timer.phase('encode'):
+                temp_board_states = np.zeros((len(legal_moves), 128))
+                temp_keys = []
+                for k, (i, j) in enumerate(legal_moves):
+                    # Perform temporary move
+                    undo = move_piece(i, j, player, pieces)
+                    temp_board_states[k] = np.reshape(
+                        board, 128)  # Obtain temporary state
+                    if cache is not None:
+                        temp_keys.append(key.flipped if flip_after else key.value)
+                    # Restore the position
+                    unmake_move(i, player, pieces, undo)
+
+            # Calculate expected return of all afterstates in a single session call
+            # and write estimated returns to return_array
+            if len(legal_moves) > 0:
+                if flip_after:
+                    temp_board_states = sym.flip_states(temp_board_states)
+                if cache is not None:
+                    expected_returns = predict_cached(
+                        temp_board_states, temp_keys, cache)
+                else:
+                    expected_returns = predict(temp_board_states)
+                if flip_after:
+                    expected_returns = -expected_returns
+                return_array[legal_moves[:, 0],
+                             legal_moves[:, 1]] = expected_returns[:, 0]
 
             # ----------------------------------------------------
             # Epsilon-Greedy Policy
             # ----------------------------------------------------
-            # With probability epsilon, choose a random action
-            if r.random() < epsilon:
-                while True:
-                    # If the action is valid...
-                    piece_index = r.randint(0, 11)
-                    move_index = r.randint(0, 7)
-                    if return_array[piece_index, move_index] != 0:
-                        # Perform move and update player
-                        player = move_piece(piece_index, move_index, player, pieces,
-                                            switch_player=True, print_move=print_move, algebraic=algebraic)
-                        break
-            # Else, act greedy w.r.t. expected return
-
-            # If no moves avalible
-            if np.any(return_array):
+            # If no moves avalible, end the game
+            if not np.any(return_array):
                 break
 
-            else:
-                # Identify indices of maximum return (white) or minimum return (black)
-                if player == 'white':
-                    # Find the indices of the maximum nonzero value
-                    maxval = np.max(return_array[np.nonzero(return_array)])
-                    maxdim = np.argwhere(return_array == maxval)
-                    piece_index = maxdim[0][0]  # Maximum (row)
-                    move_index = maxdim[0][1]  # Maximum (column)
+            with timer.phase('policy'):
+                # With probability epsilon, choose a random action
+                if r.random() < epsilon:
+                    while True:
+                        # If the action is valid...
+                        piece_index = r.randint(0, 11)
+                        move_index = r.randint(0, 7)
+                        if return_array[piece_index, move_index] != 0:
+                            # Perform move and update player
+                            player = move_piece(piece_index, move_index, player, pieces,
+                                                switch_player=True, print_move=print_move, algebraic=algebraic)
+                            break
+                # Else, choose the most visited move of the tree search
+                elif tree is not None:
+                    piece_index, move_index, score = tree.search(pieces, player)
+                    # Perform move and update player
+                    player = move_piece(piece_index, move_index, player, pieces,
+                                        switch_player=True, print_move=print_move, algebraic=algebraic)
+                # Else, search for the best move
+                elif searcher is not None:
+                    piece_index, move_index, score = searcher.search(pieces, player)
+                    # Perform move and update player
+                    player = move_piece(piece_index, move_index, player, pieces,
+                                        switch_player=True, print_move=print_move, algebraic=algebraic)
+                # Else, act greedy w.r.t. expected return
                 else:
-                    # Find the indices of the minimum nonzero value
-                    minval = np.min(return_array[np.nonzero(return_array)])
-                    mindim = np.argwhere(return_array == minval)
-                    piece_index = mindim[0][0]  # Maximum (row)
-                    move_index = mindim[0][1]  # Maximum (column)
-                # Perform move and update player
-                player = move_piece(piece_index, move_index, player, pieces,
-                                    switch_player=True, print_move=print_move, algebraic=algebraic)
+                    # Identify indices of maximum return (white) or minimum return (black)
+                    if player == 'white':
+                        # Find the indices of the maximum nonzero value
+                        maxval = np.max(return_array[np.nonzero(return_array)])
+                        maxdim = np.argwhere(return_array == maxval)
+                        piece_index = maxdim[0][0]  # Maximum (row)
+                        move_index = maxdim[0][1]  # Maximum (column)
+                    else:
+                        # Find the indices of the minimum nonzero value
+                        minval = np.min(return_array[np.nonzero(return_array)])
+                        mindim = np.argwhere(return_array == minval)
+                        piece_index = mindim[0][0]  # Maximum (row)
+                        move_index = mindim[0][1]  # Maximum (column)
+                    # Perform move and update player
+                    player = move_piece(piece_index, move_index, player, pieces,
+                                        switch_player=True, print_move=print_move, algebraic=algebraic)
+
+            # Keep the tree below the move played
+            if tree is not None:
+                tree.advance(piece_index, move_index)
+
             # Increment move counter
             move += 1
+            timer.count('plies')
 
         # Print end of game notification for visualization
         if visualize or print_move:
             print("----------END OF GAME----------")
 
-        feature_batches.append(initial_state)
-        label_batches.append(all_returns[0])
+        if all_positions:
+            feature_batches.extend(all_states)
+            label_batches.extend(np.multiply(all_signs, all_returns))
+        else:
+            feature_batches.append(all_states[0])
+            label_batches.append(all_signs[0] * all_returns[0])
 
     # Return features and labels
     feature_batches = np.array(feature_batches)
@@ -233,8 +371,44 @@ def generate_game(batch_size, max_moves, epsilon, visualize, print_move, algebra
     return feature_batches, label_batches
 
 
+def build_value_network(hidden_units, default_inputs=None):
+    """
+    Build the value function network in the default graph
+    Args: (1) hidden units, (2) tensor used when the inputs are not fed (e.g. an input pipeline)
+    Returns: (1) input placeholder, (2) predictions tensor
+    """
+    import tensorflow as tf
+
+    if default_inputs is not None:
+        inputs = tf.placeholder_with_default(default_inputs, [None, 128], name='Inputs')
+    else:
+        inputs = tf.placeholder(tf.float32, [None, 128], name='Inputs')
+
+    # ----------------------------------------------------
+    # Implementing Feedforward NN
+    # ----------------------------------------------------
+    # First fully-connected layer
+    hidden1 = tf.contrib.layers.fully_connected(
+        inputs, num_outputs=hidden_units)
+
+    # Second fully-connected layer
+    hidden2 = tf.contrib.layers.fully_connected(
+        hidden1, num_outputs=hidden_units)
+
+    # Output layer
+    predictions = tf.contrib.layers.fully_connected(
+        hidden2, num_outputs=1, activation_fn=None)
+
+    return inputs, predictions
+
+
 if __name__ == "__main__":
 
+    # Modules that need TensorFlow (see the note at the top)
+    import tensorflow as tf
+    import checkpoint as ck
+    import pipeline as pp
+
     # ----------------------------------------------------
     # Parsing Console Arguments
     # ----------------------------------------------------
@@ -262,6 +436,64 @@ if __name__ == "__main__":
         "-a", "--algebraic", help="Print moves in algebraic notation? (Default False)", type=bool)
     parser.add_argument(
         "-l", "--loadfile", help="Load  model from saved checkpoint? (Default False)", type=bool)
+    parser.add_argument(
+        "-g", "--engine", help="Move generator: pieces, bitboard, position or vector (Default pieces)", type=str)
+    parser.add_argument(
+        "-w", "--workers", help="Self-play worker processes (Default 1)", type=int)
+    parser.add_argument(
+        "-c", "--cachesize", help="Prediction cache entries, 0 to disable (Default 0)", type=int)
+    parser.add_argument(
+        "-rs", "--replaysize", help="Replay buffer capacity, 0 to train on initial states only (Default 0)", type=int)
+    parser.add_argument(
+        "-se", "--saveevery", help="Checkpoint every N training steps (Default 1)", type=int)
+    parser.add_argument(
+        "-ss", "--saveseconds", help="Checkpoint every N seconds instead of steps (Default 0)", type=float)
+    parser.add_argument(
+        "-k", "--keep", help="Number of checkpoints kept (Default 5)", type=int)
+    parser.add_argument(
+        "-ac", "--actors", help="Self-play actor processes feeding the learner, 0 to disable (Default 0)", type=int)
+    parser.add_argument(
+        "-qs", "--queuesize", help="Batches queued between actors and learner (Default 4)", type=int)
+    parser.add_argument(
+        "-st", "--staleness", help="Maximum weight versions a queued batch may lag (Default 2)", type=int)
+    parser.add_argument(
+        "-rf", "--refresh", help="Send weights to actors every N training steps (Default 1)", type=int)
+    parser.add_argument(
+        "-dp", "--depth", help="Alpha-beta search depth for greedy moves, 0 for one-ply greedy (Default 0)", type=int)
+    parser.add_argument(
+        "-sn", "--searchnodes", help="Node budget per search, 0 for none (Default 0)", type=int)
+    parser.add_argument(
+        "-sx", "--searchseconds", help="Time budget per search in seconds, 0 for none (Default 0)", type=float)
+    parser.add_argument(
+        "-mc", "--simulations", help="MCTS leaf evaluations per greedy move, 0 to disable (Default 0)", type=int)
+    parser.add_argument(
+        "-mb", "--mctsbatch", help="MCTS leaves evaluated per inference call (Default 16)", type=int)
+    parser.add_argument(
+        "-cp", "--cpuct", help="MCTS exploration constant in points (Default 2.0)", type=float)
+    parser.add_argument(
+        "-cn", "--canonical", help="Evaluate and store positions from the side to move's view? (Default False)", type=bool)
+    parser.add_argument(
+        "-ds", "--dataset", help="Directory of an on-disk dataset that keeps every visited state", type=str)
+    parser.add_argument(
+        "-sh", "--shardsize", help="Positions per dataset shard (Default 1000000)", type=int)
+    parser.add_argument(
+        "-ni", "--numpy", help="Run self-play inference in NumPy instead of a TensorFlow session? (Default False)", type=bool)
+    parser.add_argument(
+        "-tp", "--pipeline", help="Feed the optimizer from the replay buffer or dataset with tf.data? (Default False)", type=bool)
+    parser.add_argument(
+        "-pc", "--parallelcalls", help="Parallel decode calls in the input pipeline (Default 4)", type=int)
+    parser.add_argument(
+        "-sf", "--shuffle", help="Input pipeline shuffle buffer in positions (Default 10 batches)", type=int)
+    parser.add_argument(
+        "-pf", "--prefetch", help="Batches prefetched by the input pipeline (Default 2)", type=int)
+    parser.add_argument(
+        "-pe", "--profileevery", help="Report phase timings as JSON lines every N steps, 0 to disable (Default 0)", type=int)
+    parser.add_argument(
+        "-pl", "--profilelog", help="File for the phase timing JSON lines (Default stdout)", type=str)
+    parser.add_argument(
+        "-pr", "--profile", help="Write a cProfile dump of a window of training steps to this file", type=str)
+    parser.add_argument(
+        "-pw", "--profilewindow", help="Training steps in the cProfile window, starting at step 1 (Default 10)", type=int)
     parser.add_argument("-rd", "--rootdir",
                         help="Root directory for project", type=str)
     parser.add_argument("-sd", "--savedir",
@@ -284,10 +516,51 @@ if __name__ == "__main__":
     visualize = args.visualize if args.visualize else False
     print_moves = args.print if args.print else False
     algebraic = args.algebraic if args.algebraic else False
+    engine = args.engine if args.engine else 'pieces'
+    workers = args.workers if args.workers else 1
+    numpy_inference = args.numpy if args.numpy else False
+    cache_size = args.cachesize if args.cachesize else 0
+    replay_size = args.replaysize if args.replaysize else 0
+    dataset_dir = args.dataset if args.dataset else None
+    shard_size = args.shardsize if args.shardsize else 1000000
+
+    # Input Pipeline
+    use_pipeline = args.pipeline if args.pipeline else False
+    parallel_calls = args.parallelcalls if args.parallelcalls else 4
+    shuffle_size = args.shuffle if args.shuffle else 0
+    prefetch = args.prefetch if args.prefetch else 2
+
+    # Search Parameters
+    search_depth = args.depth if args.depth else 0
+    search_nodes = args.searchnodes if args.searchnodes else 0
+    search_seconds = args.searchseconds if args.searchseconds else 0
+    simulations = args.simulations if args.simulations else 0
+    mcts_batch = args.mctsbatch if args.mctsbatch else 16
+    c_puct = args.cpuct if args.cpuct else 2.0
+
+    # Symmetries
+    canonical = args.canonical if args.canonical else False
+
+    # Actor/Learner Parameters
+    actors = args.actors if args.actors else 0
+    queue_size = args.queuesize if args.queuesize else 4
+    staleness = args.staleness if args.staleness is not None else 2
+    refresh = args.refresh if args.refresh else 1
+
+    # Profiling
+    profile_every = args.profileevery if args.profileevery else 0
+    profile_log = args.profilelog if args.profilelog else None
+    profile_path = args.profile if args.profile else None
+    profile_window = args.profilewindow if args.profilewindow else 10
 
     # Load File
     load_file = args.loadfile if args.loadfile else False
 
+    # Checkpointing
+    save_every = args.saveevery if args.saveevery else 1
+    save_seconds = args.saveseconds if args.saveseconds else 0
+    keep_checkpoints = args.keep if args.keep else 5
+
     # File Paths
     dir_name = args.rootdir if args.rootdir else "/Users/adamlabiosa"  # Root directory
     load_path = args.loaddir if args.loaddir else "checkpoints/model"  # Load previous model
@@ -315,37 +588,71 @@ if __name__ == "__main__":
     - visualize:        [bool]  Visualize game board during training?
     - print_moves:      [bool]  Print moves during training?
     - algebraic:        [bool]  Print moves using algebraic notation or long-form?
+    - engine:           [str]   Move generator ('pieces', 'bitboard', 'position' or 'vector' for lockstep games)
+    - workers:          [int]   Number of self-play worker processes
+    - numpy_inference:  [bool]  Evaluate self-play positions with the NumPy forward pass (inference.py)?
+    - cache_size:       [int]   Entries in the prediction cache (0 disables it)
+    - replay_size:      [int]   Capacity of the replay buffer of visited states (0 disables it)
+    - dataset_dir:      [str]   On-disk dataset of visited states, sampled when there is no replay buffer (None disables it)
+    - shard_size:       [int]   Positions per dataset shard
+    - use_pipeline:     [bool]  Feed the optimizer from the replay buffer or dataset through tf.data?
+    - parallel_calls:   [int]   Parallel decode calls in the input pipeline
+    - shuffle_size:     [int]   Input pipeline shuffle buffer in positions (0 for 10 batches)
+    - prefetch:         [int]   Batches prefetched by the input pipeline
+    - search_depth:     [int]   Alpha-beta search depth for greedy moves (0 for one-ply greedy)
+    - search_nodes:     [int]   Node budget per search (0 for none)
+    - search_seconds:   [float] Time budget per search in seconds (0 for none)
+    - simulations:      [int]   MCTS leaf evaluations per greedy move (0 disables MCTS)
+    - mcts_batch:       [int]   MCTS leaves selected under virtual loss per inference call
+    - c_puct:           [float] MCTS exploration constant
+    - canonical:        [bool]  Flip positions with black to move so the network always sees white to move?
+    - actors:           [int]   Actor processes playing continuously for the learner (0 disables them)
+    - queue_size:       [int]   Batches held between actors and learner before actors block
+    - staleness:        [int]   Maximum weight versions a batch may lag before it is dropped
+    - refresh:          [int]   Training steps between weight updates sent to the actors
+    - profile_every:    [int]   Training steps between phase timing reports (0 disables them)
+    - profile_log:      [str]   File the phase timing JSON lines are appended to (stdout if None)
+    - profile_path:     [str]   Output file for a cProfile dump of profile_window steps (None disables it)
+    - profile_window:   [int]   Number of training steps profiled with cProfile
     - load_file:        [bool]  Load pre-trained model?
+    - save_every:       [int]   Checkpoint interval in training steps
+    - save_seconds:     [float] Checkpoint interval in seconds (overrides save_every if nonzero)
+    - keep_checkpoints: [int]   Number of versioned checkpoints kept
     - dir_name:         [str]   Root directory filepath
     - load_path:        [str]   Path to pre-trained model from root directory
-    - save_path:        [str]   Save path from root directory
+    - save_path:        [str]   Save path from root directory (checkpoints are saved as save_path-<step>)
     - filewriter_path:  [str]   Save path for filewriter (TensorBoard)
     - training_loss     [str]   Output .txt file name / path for training loss
     """
 
     # ----------------------------------------------------
-    # Importing Session Parameters
+    # Storing Visited States
     # ----------------------------------------------------
-    # Create placeholders for inputs and target values
-    # Input dimensions: 8 x 8 x 2
-    # Target dimensions: 1 x 1
-    inputs = tf.placeholder(tf.float32, [None, 128], name='Inputs')
-    targets = tf.placeholder(tf.float32, shape=(None, 1), name='Targets')
+    # Replay buffer of every visited state and its return, bit-packed
+    replay = rp.ReplayBuffer(replay_size) if replay_size else None
+    # Dataset of every visited state kept across runs; existing shards are reused
+    dataset = ds.ShardedDataset(dataset_dir, shard_size=shard_size) if dataset_dir else None
+    # Games return every visited state when they are stored
+    all_positions = replay is not None or dataset is not None
+    # Input pipeline drawing training batches from the buffer, or the dataset if there is none
+    pipeline = None
+    if use_pipeline and all_positions:
+        pipeline = pp.InputPipeline(replay if replay is not None else dataset, batch_size,
+                                    parallel_calls=parallel_calls, shuffle_size=shuffle_size, prefetch=prefetch)
 
     # ----------------------------------------------------
-    # Implementing Feedforward NN
+    # Importing Session Parameters
     # ----------------------------------------------------
-    # First fully-connected layer
-    hidden1 = tf.contrib.layers.fully_connected(
-        inputs, num_outputs=hidden_units)
-
-    # Second fully-connected layer
-    hidden2 = tf.contrib.layers.fully_connected(
-        hidden1, num_outputs=hidden_units)
-
-    # Output layer
-    predictions = tf.contrib.layers.fully_connected(
-        hidden2, num_outputs=1, activation_fn=None)
+    # Create placeholders for inputs and target values, which default to the pipeline's
+    # batches when it is used
+    # Input dimensions: 8 x 8 x 2
+    # Target dimensions: 1 x 1
+    if pipeline:
+        inputs, predictions = build_value_network(hidden_units, default_inputs=pipeline.states)
+        targets = tf.placeholder_with_default(pipeline.targets, shape=(None, 1), name='Targets')
+    else:
+        inputs, predictions = build_value_network(hidden_units)
+        targets = tf.placeholder(tf.float32, shape=(None, 1), name='Targets')
 
     # ----------------------------------------------------
     # Calculate Loss and Define Optimizer
@@ -362,7 +669,21 @@ if __name__ == "__main__":
     # ----------------------------------------------------
     init = tf.global_variables_initializer()
     saver = tf.train.Saver()  # Instantiate Saver class
+    # Background writer for versioned checkpoints
+    checkpointer = ck.AsyncCheckpointer(
+        save_path, every_steps=save_every, every_seconds=save_seconds, keep=keep_checkpoints)
     t_loss = []  # Placeholder for training loss values
+    # Start self-play workers, each with its own copy of the network
+    pool = sp.SelfPlayPool(workers, hidden_units, cache_size, numpy_inference) if workers > 1 else None
+    # NumPy copy of the network for games played in this process, refreshed every step
+    network = nf.ValueNetwork() if numpy_inference else None
+    # Cache of predictions by position hash, cleared whenever the weights change
+    cache = z.PredictionCache(cache_size) if cache_size else None
+    # Phase timers (self-play phases are only seen when games are played in this process)
+    profile_file = open(profile_log, 'a') if profile_log else None
+    if profile_every:
+        timer = pf.PhaseTimer(every=profile_every, output=profile_file)
+    step_profiler = pf.StepProfiler(profile_path, steps=profile_window) if profile_path else None
     with tf.Session() as sess:
 
         # Create Tensorboard graph
@@ -372,20 +693,67 @@ if __name__ == "__main__":
         # If there is a model checkpoint saved, load the checkpoint. Else, initialize variables.
         if load_file:
             # Restore saved session
-            saver.restore(sess, load_path)
+            saver.restore(sess, ck.resolve(load_path))
         else:
             # Initialize the variables
             sess.run(init)
 
+        # Start actors with the initial weights; they play continuously from here on
+        actor_learner = None
+        if actors:
+            actor_learner = sp.ActorLearner(actors, hidden_units, sess.run(tf.trainable_variables()),
+                                            queue_size, staleness, cache_size=cache_size, numpy_inference=numpy_inference,
+                                            batch_size=batch_size, max_moves=max_moves, epsilon=epsilon,
+                                            visualize=visualize, print_move=print_moves, algebraic=algebraic,
+                                            engine=engine, all_positions=all_positions, search_depth=search_depth,
+                                            search_nodes=search_nodes, search_seconds=search_seconds, simulations=simulations,
+                                            mcts_batch=mcts_batch, c_puct=c_puct, canonical=canonical)
+
         # Obtain start time
         start_time = t.time()
 
         # For each training step, generate a random board
         for step in range(0, num_training):
 
+            # Start or stop the cProfile window
+            if step_profiler:
+                step_profiler.step(step)
+
             # Run game and generate feature and label batches
-            features, labels = generate_game(batch_size=batch_size, max_moves=max_moves,
-                                             epsilon=epsilon, visualize=visualize, print_move=print_moves, algebraic=algebraic)
+            with timer.phase('selfplay'):
+                if actor_learner:
+                    # Take the next batch the actors have queued
+                    features, labels = actor_learner.generate_game()
+                elif pool:
+                    # Send the current weights to the workers along with their games
+                    weights = sess.run(tf.trainable_variables())
+                    features, labels = pool.generate_game(weights, step, batch_size=batch_size, max_moves=max_moves,
+                                                          epsilon=epsilon, visualize=visualize, print_move=print_moves, algebraic=algebraic,
+                                                          engine=engine, all_positions=all_positions, search_depth=search_depth,
+                                                          search_nodes=search_nodes, search_seconds=search_seconds, simulations=simulations,
+                                                          mcts_batch=mcts_batch, c_puct=c_puct, canonical=canonical)
+                else:
+                    if network is not None:
+                        network.set_weights(sess.run(tf.trainable_variables()))
+                    features, labels = generate_game(batch_size=batch_size, max_moves=max_moves,
+                                                     epsilon=epsilon, visualize=visualize, print_move=print_moves, algebraic=algebraic,
+                                                     engine=engine, cache=cache, all_positions=all_positions, search_depth=search_depth,
+                                                     search_nodes=search_nodes, search_seconds=search_seconds, simulations=simulations,
+                                                     mcts_batch=mcts_batch, c_puct=c_puct, canonical=canonical)
+            timer.count('games', batch_size)
+
+            # Store every visited state and train on a minibatch sampled from the buffer,
+            # or from the dataset if there is no buffer (the pipeline samples on its own thread)
+            with pipeline.lock if pipeline else pf.NO_OP:
+                if dataset is not None:
+                    dataset.add(features, labels)
+                if replay is not None:
+                    replay.add(features, labels)
+            if pipeline is None:
+                if replay is not None:
+                    features, labels = replay.sample(batch_size)
+                elif dataset is not None:
+                    features, labels = dataset.sample(batch_size)
 
             # ----------------------------------------------------
             # Optimize Model for Current Simulation
@@ -393,14 +761,31 @@ if __name__ == "__main__":
             # Print step
             print("\nOptimizing at step", step)
             # Run optimizer, loss, and predicted error ops in graph
-            predictions_, targets_, _, loss_ = sess.run([predictions, targets, optimizer, loss], feed_dict={
-                                                        inputs: np.reshape(features, (batch_size, 128)), targets: np.expand_dims(labels, axis=1)})
+            with timer.phase('optimizer'):
+                if pipeline:
+                    # Inputs and targets come from the pipeline's next prefetched batch
+                    predictions_, targets_, _, loss_ = sess.run([predictions, targets, optimizer, loss])
+                else:
+                    predictions_, targets_, _, loss_ = sess.run([predictions, targets, optimizer, loss], feed_dict={
+                                                                inputs: np.reshape(features, (batch_size, 128)), targets: np.expand_dims(labels, axis=1)})
 
             # Record loss
             t_loss.append(loss_)
 
-            # Save and overwrite the session at each training step
-            saver.save(sess, save_path)
+            # Cached predictions are stale once the weights are updated
+            if cache is not None:
+                cache.clear()
+
+            # Periodically refresh the actors' weights
+            if actor_learner and (step + 1) % refresh == 0:
+                actor_learner.publish(sess.run(tf.trainable_variables()))
+
+            # Hand a snapshot to the background checkpoint writer when the interval is due
+            with timer.phase('checkpoint'):
+                checkpointer.save(sess, step)
+
+            # Report phase timings at the end of each window
+            timer.step(step)
             # Writing summaries to Tensorboard at each training step
             # summ = sess.run(merged)
             # writer.add_summary(summ,step)
@@ -428,10 +813,36 @@ if __name__ == "__main__":
                 min_remaining = round(sec_remaining / 60)
                 print("Time Remaining: %d minutes" % min_remaining)
 
+                # Report prediction cache statistics, summed over the processes playing games
+                if cache_size:
+                    counts = actor_learner if actor_learner else pool if pool else cache
+                    lookups = counts.hits + counts.misses
+                    print("Cache hit rate: %.3f (%d hits, %d misses)" %
+                          (counts.hits / lookups if lookups else 0.0, counts.hits, counts.misses))
+
+        # Finish a cProfile window cut short by the end of training
+        if step_profiler:
+            step_profiler.close()
+        if profile_file:
+            profile_file.close()
+
         # Write training loss to file
         t_loss = np.array(t_loss)
         with open(training_loss, 'a') as file_object:
             np.savetxt(file_object, t_loss)
 
+        # Stop actors
+        if actor_learner:
+            print("Stale batches dropped: %d" % actor_learner.dropped)
+            actor_learner.close()
+
+        # Save the final weights and wait for the checkpoint writer to finish
+        checkpointer.save(sess, num_training, force=True)
+        checkpointer.close()
+
         # Close the writer
         writer.close()
+
+    # Stop self-play workers
+    if pool:
+        pool.close()
@@ -0,0 +1,215 @@
+#---------------------------------------------
+# Monte Carlo Tree Search for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import numpy as np
+import state as s
+import symmetry as sym
+import math
+
+# UCT search over the position held in the piece list. Every round selects up to
+# batch_size leaves: each descent makes its moves in place, expands the leaf it reaches,
+# copies the leaf's board state and unmakes back to the root. The selected edges carry a
+# virtual loss until the round is backed up, which steers later descents in the same
+# round to other leaves. All leaves of a round are scored in one [K, 128] predict call.
+#
+# The network has no policy head, so unvisited children are tried first (captures
+# before steps) and the value is the only signal. Node values are stored from white's
+# side as material plus the network's estimate of the return still to come, so they stay
+# comparable when the root moves down the tree. Positions without legal moves end the
+# game and are scored by material alone. With canonical, leaves with black to move are
+# evaluated flipped (see symmetry.py).
+#
+# advance() keeps the subtree below the move just played, so statistics gathered while
+# searching one move are reused for the next.
+
+
+class Node():
+
+    """Search tree node"""
+
+    __slots__ = ('moves', 'children', 'visits', 'value_sum')
+
+    def __init__(self):
+        self.moves = None       # Legal (piece index, move index) pairs, None until expanded
+        self.children = None    # Child node for each move
+        self.visits = 0
+        self.value_sum = 0.0    # Sum of backed-up values from white's side
+
+
+class MCTS():
+
+    """Monte Carlo tree search player with batched leaf evaluation"""
+
+    def __init__(self, predict, simulations=200, batch_size=16, c_puct=2.0, virtual_loss=1.0, engine='pieces',
+                 canonical=False):
+
+        # Args: (1) function mapping [N, 128] board states to [N, 1] returns,
+        #       (2) leaf evaluations per move, (3) leaves per predict call,
+        #       (4) exploration constant (in points), (5) points subtracted per pending descent,
+        #       (6) move generator, (7) network trained on side-to-move positions?
+        self.predict = predict
+        self.simulations = simulations
+        self.batch_size = batch_size
+        self.c_puct = c_puct
+        self.virtual_loss = virtual_loss
+        self.engine = engine
+        self.canonical = canonical
+        self.reset()
+
+
+    def reset(self):
+
+        """Discarding the tree at the start of a game"""
+
+        # Requires: none
+        # Returns: void
+        self.root = Node()
+
+
+    def advance(self, piece_index, move_index):
+
+        """Moving the root to the child reached by a played move"""
+
+        # Requires: (1) piece index, (2) move index of the move played (by either side)
+        # Returns: void
+        if self.root.moves is not None and (piece_index, move_index) in self.root.moves:
+            self.root = self.root.children[self.root.moves.index((piece_index, move_index))]
+        else:
+            self.root = Node()
+
+
+    def expand(self, node, pieces, player):
+
+        """Listing a node's legal moves and creating its children"""
+
+        # Requires: (1) node, (2) piece list at the node, (3) player to move
+        # Returns: void
+        legal = [(i, j) for i, j in np.argwhere(s.action_space(pieces, player, engine=self.engine) == 1)]
+        # Captures first, so they are the first unvisited children tried
+        legal.sort(key=lambda action: action[1] % 4 < 2)
+        node.moves = legal
+        node.children = [Node() for move in legal]
+
+
+    def select(self, node, sign):
+
+        """Choosing the child with the highest upper confidence bound"""
+
+        # Requires: (1) expanded node, (2) +1 if white is to move, -1 if black
+        # Returns: child index
+        best = 0
+        best_score = -math.inf
+        exploration = self.c_puct * math.sqrt(math.log(node.visits + 1))
+        for k, child in enumerate(node.children):
+            if child.visits == 0:
+                return k
+            score = sign * child.value_sum / child.visits + exploration / math.sqrt(child.visits)
+            if score > best_score:
+                best = k
+                best_score = score
+        return best
+
+
+    def descend(self, pieces, player):
+
+        """Selecting one leaf and applying virtual loss along the way"""
+
+        # Requires: (1) piece list at the root, (2) player to move at the root
+        # Returns: (1) list of (node, sign of the player who moved into it), (2) leaf board state
+        #          or None for a terminal leaf, (3) leaf material (white points - black points),
+        #          (4) player to move at the leaf
+        node = self.root
+        node.visits += 1
+        path = [(node, 0)]
+        made = []
+        while True:
+            if node.moves is None:
+                self.expand(node, pieces, player)
+                break
+            if not node.moves:
+                break
+
+            sign = 1 if player == 'white' else -1
+            k = self.select(node, sign)
+            i, j = node.moves[k]
+            offset = 0 if player == 'white' else 12
+            made.append((pieces[i + offset], pieces[i + offset].move(j, pieces)))
+
+            # Count the visit now and a provisional loss for the mover until backup
+            node = node.children[k]
+            node.visits += 1
+            node.value_sum -= sign * self.virtual_loss
+            path.append((node, sign))
+            player = 'black' if player == 'white' else 'white'
+
+        # Terminal leaves need no network call
+        state = pieces[0].board.copy() if node.moves else None
+        material = s.points(pieces)
+
+        # Take the moves back to restore the root position
+        for piece, undo in reversed(made):
+            piece.unmake(undo)
+
+        return path, state, material, player
+
+
+    def backup(self, path, value):
+
+        """Adding a leaf value to its path and removing the virtual loss"""
+
+        # Requires: (1) path from descend, (2) leaf value from white's side
+        # Returns: void
+        for node, sign in path:
+            node.value_sum += value + sign * self.virtual_loss
+
+
+    def search(self, pieces, player):
+
+        """Running simulations and choosing the most visited move"""
+
+        # Requires: (1) piece list, (2) player to move
+        # Returns: (1) piece index, (2) move index, (3) expected points gained by the player,
+        #          or None without legal moves
+        if pieces[0].board is None:
+            s.attach_board(pieces)
+        if self.root.moves is None:
+            self.expand(self.root, pieces, player)
+        if not self.root.moves:
+            return None
+
+        simulations = 0
+        while simulations < self.simulations:
+
+            # Select a batch of leaves under virtual loss
+            paths = []
+            states = []
+            black_to_move = []
+            for k in range(0, min(self.batch_size, self.simulations - simulations)):
+                path, state, material, leaf_player = self.descend(pieces, player)
+                if state is None:
+                    self.backup(path, material)
+                else:
+                    paths.append((path, material))
+                    states.append(state)
+                    black_to_move.append(leaf_player == 'black')
+                simulations += 1
+
+            # Evaluate the non-terminal leaves together and back their values up
+            if states:
+                if self.canonical:
+                    values = sym.evaluate(self.predict, np.array(states), np.array(black_to_move))[:, 0]
+                else:
+                    values = self.predict(np.array(states))[:, 0]
+                for (path, material), value in zip(paths, values):
+                    self.backup(path, material + value)
+
+        visits = [child.visits for child in self.root.children]
+        k = int(np.argmax(visits))
+        child = self.root.children[k]
+        sign = 1 if player == 'white' else -1
+        value = sign * (child.value_sum / child.visits - s.points(pieces)) if child.visits else 0.0
+        return self.root.moves[k][0], self.root.moves[k][1], value
@@ -0,0 +1,51 @@
+#---------------------------------------------
+# Bit-Packed Board States for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import numpy as np
+import squares as sq
+
+# The network input (state.board_state) has one plane per colour over all 64 squares,
+# but only the 32 dark squares can hold a piece. A packed state keeps one uint32 word per
+# colour with bit n set if dark square n (see squares.py) is occupied: 8 bytes instead of
+# 1 KiB of float64 or 512 bytes of float32. Kings are not part of the network input, so
+# they are not stored (bitboard.from_pieces gives the three-word form with kings).
+# Packing and unpacking are vectorized over the whole batch.
+
+FILES = np.array(sq.FILES)
+RANKS = np.array(sq.RANKS)
+BITS = np.arange(32, dtype=np.uint32)
+
+# Position of each dark square's white feature in the flattened 8 x 8 x 2 input
+FEATURE_INDEX = ((FILES - 1) * 8 + (RANKS - 1)) * 2
+
+
+def pack_states(states):
+    """Packing board states into two words each"""
+
+    # Args: (1) board states (any shape with N * 128 entries, laid out as 8 x 8 x 2)
+    # Returns: N x 2 uint32 array of (white, black) occupancy
+    boards = np.reshape(states, (-1, 8, 8, 2))
+    dark = boards[:, FILES - 1, RANKS - 1, :] != 0     # N x 32 x 2
+
+    # Pieces on light squares cannot be represented
+    if np.count_nonzero(dark) != np.count_nonzero(boards):
+        raise ValueError("Board states with pieces on light squares cannot be packed")
+
+    return np.sum(dark.astype(np.uint32) << BITS[None, :, None], axis=1, dtype=np.uint32)
+
+
+def unpack_states(packed):
+    """Expanding packed states into network inputs"""
+
+    # Args: (1) N x 2 packed states
+    # Returns: N x 128 float32 board states
+    packed = np.asarray(packed, dtype=np.uint32)
+    bits = (packed[:, :, None] >> BITS) & 1            # N x 2 x 32
+    states = np.zeros((len(packed), 128), dtype=np.float32)
+    states[:, FEATURE_INDEX] = bits[:, 0]
+    states[:, FEATURE_INDEX + 1] = bits[:, 1]
+    return states
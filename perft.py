@@ -0,0 +1,129 @@
+#---------------------------------------------
+# Perft Node Counts for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import numpy as np
+import pieces as p
+import state as s
+import main as m
+import time as t
+import argparse
+import sys
+
+# Enumerates the full move tree to a fixed depth and counts the leaf positions.
+# Two move generators that agree on every perft count generate the same moves,
+# and nodes/sec measures their raw speed.
+
+# Positions are given as <side to move>:W<white squares>:B<black squares>, with squares
+# in algebraic notation and a K prefix for kings, e.g. "W:Wa1,c3,Kd6:Bb8,f6"
+
+
+def parse_position(text):
+    """Building a piece list from a position string"""
+
+    # Args: (1) position string
+    # Returns: (1) piece list, (2) player to move
+
+    side, white, black = text.strip().split(':')
+    if side.upper() not in ('W', 'B') or white[:1].upper() != 'W' or black[:1].upper() != 'B':
+        raise ValueError("Position must look like W:Wa1,c3:Bb8,Kf6, got " + text)
+    player = 'white' if side.upper() == 'W' else 'black'
+
+    piece_list = []
+    for color, squares in (('white', white[1:]), ('black', black[1:])):
+        squares = [square.strip() for square in squares.split(',') if square.strip()]
+        if len(squares) > 12:
+            raise ValueError("At most 12 %s pieces, got %d" % (color, len(squares)))
+
+        for k in range(0, 12):
+            if k < len(squares):
+                king = squares[k][0].upper() == 'K'
+                square = squares[k][1:] if king else squares[k]
+                file = 'abcdefgh'.index(square[0].lower()) + 1
+                rank = int(square[1:])
+                if (file + rank) % 2 != 0:
+                    raise ValueError("Square %s is not a playable square" % square)
+                piece = p.Piece(color, file, rank)
+                if king:
+                    piece.name = 'King'
+                    piece.symbol = 'K'
+                    piece.value = 3
+            else:
+                # Fill the remaining slots with captured pieces
+                piece = p.Piece(color, 1, 1)
+                piece.remove()
+            piece_list.append(piece)
+
+    return piece_list, player
+
+
+def perft(pieces, player, depth, engine='pieces'):
+    """Counting leaf positions of the move tree"""
+
+    # Args: (1) piece list, (2) player to move, (3) depth, (4) move generator
+    # Returns: number of positions reached after depth moves
+    if depth == 0:
+        return 1
+
+    next_player = 'black' if player == 'white' else 'white'
+    nodes = 0
+    for i, j in np.argwhere(s.action_space(pieces, player, engine=engine) == 1):
+        undo = m.move_piece(i, j, player, pieces)
+        nodes += perft(pieces, next_player, depth - 1, engine)
+        m.unmake_move(i, player, pieces, undo)
+
+    return nodes
+
+
+def run(pieces, player, max_depth, engine):
+    """Reporting perft counts and speed for each depth"""
+
+    # Args: (1) piece list, (2) player to move, (3) maximum depth, (4) move generator
+    # Returns: list of node counts for depths 1..max_depth
+    counts = []
+    print("\nEngine: " + engine)
+    print("%5s %14s %10s %12s" % ('Depth', 'Nodes', 'Seconds', 'Nodes/sec'))
+    for depth in range(1, max_depth + 1):
+        start = t.perf_counter()
+        nodes = perft(pieces, player, depth, engine)
+        elapsed = t.perf_counter() - start
+        counts.append(nodes)
+        print("%5d %14d %10.3f %12.0f" % (depth, nodes, elapsed, nodes / elapsed if elapsed else 0))
+
+    return counts
+
+
+if __name__ == "__main__":
+
+    # ----------------------------------------------------
+    # Parsing Console Arguments
+    # ----------------------------------------------------
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", "--depth", help="Maximum depth (Default 6)", type=int)
+    parser.add_argument("-p", "--position", help="Start position, e.g. W:Wa1,c3:Bb8,Kf6 (Default initial position)", type=str)
+    parser.add_argument("-g", "--engine", help="Move generator: pieces, bitboard or position (Default pieces)", type=str)
+    parser.add_argument("-c", "--compare", help="Second move generator whose counts must match", type=str)
+    args = parser.parse_args()
+
+    max_depth = args.depth if args.depth else 6
+    engine = args.engine if args.engine else 'pieces'
+
+    if args.position:
+        pieces, player = parse_position(args.position)
+    else:
+        pieces, player = s.initialize_pieces(), 'white'
+    # Keep the board and square index up to date, as self-play does
+    s.attach_board(pieces)
+
+    counts = run(pieces, player, max_depth, engine)
+
+    # Exit with an error if the two generators disagree
+    if args.compare:
+        other_counts = run(pieces, player, max_depth, args.compare)
+        if counts != other_counts:
+            print("\nMISMATCH: %s %s vs %s %s" % (engine, counts, args.compare, other_counts))
+            sys.exit(1)
+        print("\nCounts match")
@@ -5,11 +5,12 @@
 # Last Edited: 2021
 # University of Wisconsin - Madison
 # ----------------------------------------------------
-import tensorflow as tf
 import numpy as np
 import pieces as p
 import random as r
 import state as s
+import squares as sq
+import zobrist as z
 import time as t
 import copy as c
 import math
@@ -45,6 +46,12 @@ class Piece():
 		self.file = start_file
 		self.rank = start_rank
 
+		# Board tensor, square index and position hash kept up to date on move/remove
+		# (see state.attach_board and zobrist.attach_key)
+		self.board = None
+		self.squares = None
+		self.key = None
+
 
 	# Returning numpy array with possible actions for piece
 	# Array format:
@@ -58,276 +65,57 @@ class Piece():
 		# Returns: numpy array
 
 		# The piece can move diagonally forward by one square, or two if capturing.
+		# Kings can also move backward.
 
-		# For each tile along one of the four movement vectors, append coordinate if:
-		# (1) The index is in bounds
-		# (2) There is no piece of the same color
-		# (3) There was no piece of the opposite color in the preceding step
+		# For each slot of the action vector, look up the neighbouring square and
+		# jump-landing square (see squares.py) and set the slot if:
+		# (1) The square is on the board and empty, for a step
+		# (2) The neighbouring square holds an opponent and the landing square is empty, for a jump
+		# Squares are looked up in the attached square index (see state.attach_board)
 
-		# Initialize action vector:
-		# [Forward left, Forward right, Jump Left, Jump Right, 4 zeros]
+		# Action vector:
+		# Piece: [Forward left, Forward right, Jump Left, Jump Right, 4 zeros]
+		# King: [Left up, Right up, Jump left up, Jump right up, Left down, Right down, Jump left down, Jump right down]
 		if self.name=='Piece':
+			slots = sq.MAN_SLOTS[self.color]
+		else:
+			slots = sq.KING_SLOTS
 
-			action_space = np.zeros((1,8))
-
-			# Initialize coordinate aray
-			coordinates = []
-
-			if self.is_active:
-
-				# color = white
-				if self.color == 'white':
-
-					# if in range and no piece left
-					pos_left_move = False
-					if self.file-1 > 0 and self.rank+1 < 9: # in range
-						pos_left_move = True
-						for piece in piece_list:
-							if piece.is_active and piece.file==self.file-1 and piece.rank==self.rank+1:
-								# is a piece in the way
-								pos_left_move = False
-
-					# if in range and no piece right add
-					pos_right_move = False
-					if self.file+1 < 9 and self.rank+1 < 9: # in range
-						pos_right_move = True
-						for piece in piece_list:
-							if piece.is_active and piece.file==self.file+1 and piece.rank==self.rank+1:
-								# is a piece in the way
-								pos_right_move = False
-
-					# if piece left and jump possible add
-					pos_left_jump = False
-					if self.file-2 > 0 and self.rank+2 < 9: # in range
-						for piece in piece_list:
-							if piece.is_active and piece.file==self.file-1 and piece.rank==self.rank+1 and piece.color!=self.color:
-								# there is a piece to jump
-								pos_left_jump = True
-						for piece in piece_list:
-							if piece.is_active and piece.file==self.file-2 and piece.rank==self.rank+2:
-								# there is a piece to jump
-								pos_left_jump = False
-
-
-					# if piece right and jump possible add
-					pos_right_jump = False
-					if self.file+2 < 9 and self.rank+2 < 9: # in range
-						for piece in piece_list:
-							if piece.is_active and piece.file==self.file+1 and piece.rank==self.rank+1 and piece.color!=self.color:
-								# there is a piece to jump
-								pos_right_jump = True
-						for piece in piece_list:
-							if piece.is_active and piece.file==self.file+2 and piece.rank==self.rank+2:
-								# there is a piece to jump
-								pos_right_jump = False
-
-				# color = black
-				if self.color == 'black':
-
-					# if in range and no piece left
-					pos_left_move = False
-					if self.file-1 > 0 and self.rank-1 > 0: # in range
-						pos_left_move = True
-						for piece in piece_list:
-							if piece.is_active and piece.file==self.file-1 and piece.rank==self.rank-1:
-								# is a piece in the way
-								pos_left_move = False
-
-					# if in range and no piece right add
-					pos_right_move = False
-					if self.file+1 < 9 and self.rank-1 > 0: # in range
-						pos_right_move = True
-						for piece in piece_list:
-							if piece.is_active and piece.file==self.file+1 and piece.rank==self.rank-1:
-								# is a piece in the way
-								pos_right_move = False
-
-					# if piece left and jump possible add
-					pos_left_jump = False
-					if self.file-2 > 0 and self.rank-2 > 0: # in range
-						for piece in piece_list:
-							if piece.is_active and piece.file==self.file-1 and piece.rank==self.rank-1 and piece.color!=self.color:
-								# there is a piece to jump
-								pos_left_jump = True
-						for piece in piece_list:
-							if piece.is_active and piece.file==self.file-2 and piece.rank==self.rank-2:
-								# there is a piece to jump
-								pos_left_jump = False
-
-
-					# if piece right and jump possible add
-					pos_right_jump = False
-					if self.file+2 < 9 and self.rank-2 > 0: # in range
-						for piece in piece_list:
-							if piece.is_active and piece.file==self.file+1 and piece.rank==self.rank-1 and piece.color!=self.color:
-								# there is a piece to jump
-								pos_right_jump = True
-						for piece in piece_list:
-							if piece.is_active and piece.file==self.file+2 and piece.rank==self.rank-2:
-								# there is a piece to jump
-								pos_right_jump = False
-
-
-				if pos_left_move:
-					action_space[0, 0] = 1
-					coordinates.append([self.file-1, self.rank+1])
-				if pos_right_move:
-					action_space[0, 1] = 1
-					coordinates.append([self.file+1, self.rank+1])
-				if pos_left_jump:
-					action_space[0, 2] = 1
-					coordinates.append([self.file-2, self.rank+2])
-				if pos_right_jump:
-					action_space[0, 3] = 1
-					coordinates.append([self.file+2, self.rank+2])
-
-				# Convert coordinates to numpy array
-				coordinates = np.asarray(coordinates)
-
-			# Return possible moves
-			if return_coordinates:
-				return coordinates
-			else:
-				return action_space
+		action_space = np.zeros((1,8))
 
-		# IS KING
-		else:
+		# Initialize coordinate aray
+		coordinates = []
 
-			action_space = np.zeros((1,8))
-
-			# Initialize coordinate aray
-			coordinates = []
-
-			if self.is_active:
-
-				# UP
-
-				# if in range and no piece left
-				pos_left_move_up = False
-				if self.file-1 > 0 and self.rank+1 < 9: # in range
-					pos_left_move_up = True
-					for piece in piece_list:
-						if piece.is_active and piece.file==self.file-1 and piece.rank==self.rank+1:
-							# is a piece in the way
-							pos_left_move_up = False
-
-				# if in range and no piece right add
-				pos_right_move_up = False
-				if self.file+1 < 9 and self.rank+1 < 9: # in range
-					pos_right_move_up = True
-					for piece in piece_list:
-						if piece.is_active and piece.file==self.file+1 and piece.rank==self.rank+1:
-							# is a piece in the way
-							pos_right_move_up = False
-
-				# if piece left and jump possible add
-				pos_left_jump_up = False
-				if self.file-2 > 0 and self.rank+2 < 9: # in range
-					for piece in piece_list:
-						if piece.is_active and piece.file==self.file-1 and piece.rank==self.rank+1 and piece.color!=self.color:
-							# there is a piece to jump
-							pos_left_jump_up = True
-					for piece in piece_list:
-						if piece.is_active and piece.file==self.file-2 and piece.rank==self.rank+2:
-							# there is a piece to jump
-							pos_left_jump_up = False
-
-
-				# if piece right and jump possible add
-				pos_right_jump_up = False
-				if self.file+2 < 9 and self.rank+2 < 9: # in range
-					for piece in piece_list:
-						if piece.is_active and piece.file==self.file+1 and piece.rank==self.rank+1 and piece.color!=self.color:
-							# there is a piece to jump
-							pos_right_jump_up = True
-					for piece in piece_list:
-						if piece.is_active and piece.file==self.file+2 and piece.rank==self.rank+2:
-							# there is a piece to jump
-							pos_right_jump_up = False
-
-				# DOWN
-
-				# if in range and no piece left
-				pos_left_move_down = False
-				if self.file-1 > 0 and self.rank-1 > 0: # in range
-					pos_left_move_down = True
-					for piece in piece_list:
-						if piece.is_active and piece.file==self.file-1 and piece.rank==self.rank-1:
-							# is a piece in the way
-							pos_left_move_down = False
-
-				# if in range and no piece right add
-				pos_right_move_down = False
-				if self.file+1 < 9 and self.rank-1 > 0: # in range
-					pos_right_move_down = True
-					for piece in piece_list:
-						if piece.is_active and piece.file==self.file+1 and piece.rank==self.rank-1:
-							# is a piece in the way
-							pos_right_move_down = False
-
-				# if piece left and jump possible add
-				pos_left_jump_down = False
-				if self.file-2 > 0 and self.rank-2 > 0: # in range
-					for piece in piece_list:
-						if piece.is_active and piece.file==self.file-1 and piece.rank==self.rank-1 and piece.color!=self.color:
-							# there is a piece to jump
-							pos_left_jump_down = True
-					for piece in piece_list:
-						if piece.is_active and piece.file==self.file-2 and piece.rank==self.rank-2:
-							# there is a piece to jump
-							pos_left_jump_down = False
-
-
-				# if piece right and jump possible add
-				pos_right_jump_down = False
-				if self.file+2 < 9 and self.rank-2 > 0: # in range
-					for piece in piece_list:
-						if piece.is_active and piece.file==self.file+1 and piece.rank==self.rank+1 and piece.color!=self.color:
-							# there is a piece to jump
-							pos_right_jump_down = True
-					for piece in piece_list:
-						if piece.is_active and piece.file==self.file+2 and piece.rank==self.rank-2:
-							# there is a piece to jump
-							pos_right_jump_down = False
-
-
-				if pos_left_move_up:
-					action_space[0, 0] = 1
-					coordinates.append([self.file-1, self.rank+1])
-				if pos_right_move_up:
-					action_space[0, 1] = 1
-					coordinates.append([self.file+1, self.rank+1])
-				if pos_left_jump_up:
-					action_space[0, 2] = 1
-					coordinates.append([self.file-2, self.rank+2])
-				if pos_right_jump_up:
-					action_space[0, 3] = 1
-					coordinates.append([self.file+2, self.rank+2])
-				if pos_left_move_down:
-					action_space[0, 4] = 1
-					coordinates.append([self.file-1, self.rank-1])
-				if pos_right_move_down:
-					action_space[0, 5] = 1
-					coordinates.append([self.file+1, self.rank-1])
-				if pos_left_jump_down:
-					action_space[0, 6] = 1
-					coordinates.append([self.file-2, self.rank-2])
-				if pos_right_jump_down:
-					action_space[0, 7] = 1
-					coordinates.append([self.file+2, self.rank-2])
-
-				# Convert coordinates to numpy array
-				coordinates = np.asarray(coordinates)
-
-			# Return possible moves
-			if return_coordinates:
-				return coordinates
-			else:
-				return action_space
+		if self.is_active:
 
+			# Piece on each square (None if empty, squares.EDGE off the board); built here
+			# if no index is attached
+			squares = self.squares if self.squares is not None else s.square_index(piece_list)
 
+			square = sq.square_index(self.file, self.rank)
+			for slot, (direction, jump) in enumerate(slots):
+				neighbour = sq.NEIGHBOURS[square][direction]
+				if jump:
+					target = sq.JUMPS[square][direction]
+					victim = squares[neighbour]
+					possible = (victim is not None and victim is not sq.EDGE and victim.color != self.color
+								and squares[target] is None)
+				else:
+					target = neighbour
+					possible = squares[target] is None
+
+				if possible:
+					action_space[0, slot] = 1
+					coordinates.append([sq.FILES[target], sq.RANKS[target]])
 
+			# Convert coordinates to numpy array
+			coordinates = np.asarray(coordinates)
 
+		# Return possible moves
+		if return_coordinates:
+			return coordinates
+		else:
+			return action_space
 
 
 	def move(self, action, piece_list, print_move=False, algebraic=True):
@@ -335,195 +123,69 @@ class Piece():
 		"""Moving piece's position"""
 
 		# Requires:	(1) action (element of action vector), (2) piece list, (3) print move? (4) algebraic notation?
-		# Returns:	void
+		# Returns:	undo record for unmake
 
-		# Action vector:
-		# [Forward left, Forward right, Jump Left, Jump Right, 52 zeros]
+		# Action vector: see actions
 
 		# Temporarily save old position for the purposes of algebraic notation
 		old_rank = self.rank
 		old_file = self.file
-########## WHTIE VS BLACK ##############
-		
-		if self.name == 'Piece':
-
-			# Is white
-			if self.color == 'white':
-				# left move
-				if action==0:
-					self.file = self.file-1
-					self.rank = self.rank+1
-				# right move
-				elif action==1:
-					self.file = self.file+1
-					self.rank = self.rank+1
-				# left jump
-				elif action==2:
-					self.file = self.file-2
-					self.rank = self.rank+2
-				# right jump
-				elif action==3:
-					self.file = self.file+2
-					self.rank = self.rank+2
-
-				# Update move counter
-				self.move_count += 1
-
-				# If a jump move, remove piece
-
-				piece_remove = False
-				if action==2:
-					piece_remove = True
-					for piece in piece_list:
-						if piece.is_active and piece.file==old_file-1 and piece.rank==old_rank+1:
-							piece.remove()
-							piece_remove = True
-							remove_name = piece.name
-							break
-
-				if action==3:
-					piece_remove = True
-					for piece in piece_list:
-						if piece.is_active and piece.file==old_file+1 and piece.rank==old_rank+1:
-							piece.remove()
-							piece_remove = True
-							remove_name = piece.name
-							break
-
-			# Is black
-			else:
-				# left move
-				if action==0:
-					self.file = self.file-1
-					self.rank = self.rank-1
-				# right move
-				elif action==1:
-					self.file = self.file+1
-					self.rank = self.rank-1
-				# left jump
-				elif action==2:
-					self.file = self.file-2
-					self.rank = self.rank-2
-				# right jump
-				else:
-					self.file = self.file+2
-					self.rank = self.rank-2
-
-				# Update move counter
-				self.move_count += 1
-
-				# If a jump move, remove piece
-
-				piece_remove = False
-				if action==2:
-					piece_remove = True
-					for piece in piece_list:
-						if piece.is_active and piece.file==old_file-1 and piece.rank==old_rank-1:
-							piece.remove()
-							piece_remove = True
-							remove_name = piece.name
-							break
-
-				if action==3:
-					piece_remove = True
-					for piece in piece_list:
-						if piece.is_active and piece.file==old_file+1 and piece.rank==old_rank-1:
-							piece.remove()
-							piece_remove = True
-							remove_name = piece.name
-							break
-
-				# Check for promotion
-				if self.color == 'white' and self.rank == 8:
-					self.name = 'King'
-					self.symbol = 'K'
-					self.value = 3
-
-				elif self.color == 'black' and self.rank == 1:
-					self.name = 'King'
-					self.symbol = 'K'
-					self.value = 3
-
-
-		# Is King
-		else:
+		# Save attributes changed by promotion and the captured piece for unmake
+		old_name = self.name
+		old_symbol = self.symbol
+		old_value = self.value
+		captured = None
 
-			# left move up
-			if action==0:
-				self.file = self.file-1
-				self.rank = self.rank+1
-			# right move up
-			elif action==1:
-				self.file = self.file+1
-				self.rank = self.rank+1
-			# left jump up
-			elif action==2:
-				self.file = self.file-2
-				self.rank = self.rank+2
-			# right jump up
-			elif action==3:
-				self.file = self.file+2
-				self.rank = self.rank+2
-			# left move down
-			elif action==4:
-				self.file = self.file-1
-				self.rank = self.rank-1
-			# right move down
-			elif action==5:
-				self.file = self.file+1
-				self.rank = self.rank-1
-			# left jump down
-			elif action==6:
-				self.file = self.file-2
-				self.rank = self.rank-2
-			# right jump down
-			else:
-				self.file = self.file+2
-				self.rank = self.rank-2
+		# Clear the origin square of the attached board
+		self.place(0)
 
-			# Update move counter
-			self.move_count += 1
+		# Look up the direction of the action and its target square (see squares.py)
+		if self.name == 'Piece':
+			direction, jump = sq.MAN_SLOTS[self.color][action]
+		else:
+			direction, jump = sq.KING_SLOTS[action]
+		square = sq.square_index(old_file, old_rank)
+		if jump:
+			target = sq.JUMPS[square][direction]
+		else:
+			target = sq.NEIGHBOURS[square][direction]
 
-			# If a jump move, remove piece
+		self.file = sq.FILES[target]
+		self.rank = sq.RANKS[target]
 
-			piece_remove = False
-			if action==2:
-				piece_remove = True
-				for piece in piece_list:
-					if piece.is_active and piece.file==old_file-1 and piece.rank==old_rank+1:
-						piece.remove()
-						piece_remove = True
-						remove_name = piece.name
-						break
+		# Update move counter
+		self.move_count += 1
 
-			if action==3:
-				piece_remove = True
-				for piece in piece_list:
-					if piece.is_active and piece.file==old_file+1 and piece.rank==old_rank+1:
-						piece.remove()
-						piece_remove = True
-						remove_name = piece.name
-						break
-
-			if action==6:
-				piece_remove = True
+		# If a jump move, remove the piece on the neighbouring square
+		piece_remove = False
+		if jump:
+			piece_remove = True
+			neighbour = sq.NEIGHBOURS[square][direction]
+			if self.squares is not None:
+				captured = self.squares[neighbour]
+			else:
 				for piece in piece_list:
-					if piece.is_active and piece.file==old_file-1 and piece.rank==old_rank-1:
-						piece.remove()
-						piece_remove = True
-						remove_name = piece.name
+					if piece.is_active and piece.file==sq.FILES[neighbour] and piece.rank==sq.RANKS[neighbour]:
+						captured = piece
 						break
+			if captured is not None:
+				captured.remove()
+				remove_name = captured.name
 
-			if action==7:
-				piece_remove = True
-				for piece in piece_list:
-					if piece.is_active and piece.file==old_file+1 and piece.rank==old_rank-1:
-						piece.remove()
-						piece_remove = True
-						remove_name = piece.name
-						break
+		# Check for promotion
+		if self.name == 'Piece':
+			if self.color == 'white' and self.rank == 8:
+				self.name = 'King'
+				self.symbol = 'K'
+				self.value = 3
 
+			elif self.color == 'black' and self.rank == 1:
+				self.name = 'King'
+				self.symbol = 'K'
+				self.value = 3
 
+		# Set the destination square of the attached board
+		self.place(1)
 
 		# Print movement if indicated
 		file_list = ['a','b','c','d','e','f','g','h']
@@ -538,6 +200,34 @@ class Piece():
 			else:
 				print(self.name + " to " + str(self.file) + "," + str(self.rank))
 
+		# Return undo record
+		return (old_file, old_rank, old_name, old_symbol, old_value, captured)
+
+
+	def unmake(self, undo):
+
+		"""Taking back the piece's last move"""
+
+		# Requires:	undo record returned by move
+		# Returns:	void
+
+		old_file, old_rank, old_name, old_symbol, old_value, captured = undo
+
+		# Restore position and attributes changed by promotion
+		self.place(0)
+		self.file = old_file
+		self.rank = old_rank
+		self.name = old_name
+		self.symbol = old_symbol
+		self.value = old_value
+		self.move_count -= 1
+		self.place(1)
+
+		# Put back the captured piece
+		if captured is not None:
+			captured.is_active = True
+			captured.place(1)
+
 
 	def remove(self):
 
@@ -545,4 +235,22 @@ class Piece():
 
 		# Requires:	none
 		# Returns:	void
-		self.is_active = False
\ No newline at end of file
+		self.place(0)
+		self.is_active = False
+
+
+	def place(self, value):
+
+		"""Writing the piece's square in the attached board tensor, square index and hash"""
+
+		# Requires:	value (1 to set, 0 to clear)
+		# Returns:	void
+		if self.board is not None:
+			plane = 0 if self.color == 'white' else 1
+			self.board[self.file-1, self.rank-1, plane] = value
+		if self.squares is not None:
+			self.squares[sq.square_index(self.file, self.rank)] = self if value else None
+		# XOR toggles the piece's key in or out, so setting and clearing are the same update
+		if self.key is not None:
+			self.key.value ^= z.piece_key(self)
+			self.key.flipped ^= z.flipped_key(self)
\ No newline at end of file
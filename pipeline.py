@@ -0,0 +1,91 @@
+#---------------------------------------------
+# Training Input Pipeline for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import tensorflow as tf
+import numpy as np
+import packing as pk
+import threading
+
+# Feeds the optimizer from stored self-play positions with tf.data instead of feed_dict.
+# A generator draws raw rows from the source (the replay buffer in memory or the sharded
+# dataset on disk), in their stored form: bit-packed words or unpacked states. Chunks of
+# rows are decoded to the 128-float network input in parallel map calls, shuffled,
+# batched and prefetched, so the next batches are ready while the optimizer runs.
+#
+# The pipeline tensors become the defaults of the network's input and target
+# placeholders (see main.build_value_network), so running the optimizer without a
+# feed_dict trains on the next batch, while self-play keeps feeding the inputs.
+#
+# The generator runs on a TensorFlow thread, so the training loop stores new positions
+# while holding the pipeline's lock. Prefetched batches are drawn before the newest
+# positions are stored, so they may lag the source by up to prefetch batches.
+
+# For each of the 128 network features, its bit in the 64 unpacked (white, black) bits,
+# or 64 (an always-zero column) for light squares
+INPUT_INDEX = np.full(128, 64, dtype=np.int32)
+INPUT_INDEX[pk.FEATURE_INDEX] = np.arange(32)
+INPUT_INDEX[pk.FEATURE_INDEX + 1] = np.arange(32) + 32
+
+
+class InputPipeline():
+
+    """tf.data pipeline of (board state, return) batches drawn from a replay buffer or dataset"""
+
+    def __init__(self, source, batch_size, parallel_calls=4, shuffle_size=0, prefetch=2, chunk_size=0):
+
+        # Args: (1) rp.ReplayBuffer or ds.ShardedDataset, (2) batch size,
+        #       (3) parallel decode calls, (4) shuffle buffer in positions (0 for 10 batches),
+        #       (5) batches prefetched, (6) rows drawn per generator call (0 for one batch)
+        self.source = source
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size if chunk_size else batch_size
+        self.lock = threading.Lock()
+
+        width = 2 if source.packed else 128
+        dtype = tf.int64 if source.packed else tf.float32
+        data = tf.data.Dataset.from_generator(self.draw, (dtype, tf.float32),
+                                              (tf.TensorShape([None, width]), tf.TensorShape([None])))
+        data = data.map(self.decode if source.packed else self.cast, num_parallel_calls=parallel_calls)
+        data = data.flat_map(lambda states, returns: tf.data.Dataset.from_tensor_slices((states, returns)))
+        data = data.shuffle(shuffle_size if shuffle_size else 10 * batch_size)
+        data = data.batch(batch_size)
+        data = data.prefetch(prefetch)
+        self.states, self.returns = data.make_one_shot_iterator().get_next()
+        # Targets are fed to the loss as batch_size x 1
+        self.targets = tf.expand_dims(self.returns, axis=1)
+
+
+    def draw(self):
+
+        """Generating chunks of stored rows"""
+
+        # Requires: none
+        # Returns: generator of (1) chunk_size stored states, (2) chunk_size returns
+        while True:
+            with self.lock:
+                states, returns = self.source.sample(self.chunk_size, unpack=False)
+            if self.source.packed:
+                states = states.astype(np.int64)
+            yield states, returns
+
+
+    def decode(self, packed, returns):
+
+        """Expanding packed states into network inputs in the graph"""
+
+        # Requires: (1) N x 2 packed states, (2) N returns
+        # Returns: (1) N x 128 float32 board states, (2) N returns
+        shifts = tf.constant(2 ** np.arange(32, dtype=np.int64))
+        bits = tf.floormod(tf.floordiv(tf.expand_dims(packed, 2), shifts), 2)   # N x 2 x 32
+        bits = tf.reshape(bits, [-1, 64])
+        bits = tf.concat([bits, tf.zeros_like(bits[:, :1])], axis=1)
+        states = tf.gather(tf.cast(bits, tf.float32), INPUT_INDEX, axis=1)
+        return states, returns
+
+
+    def cast(self, states, returns):
+        return tf.cast(states, tf.float32), returns
@@ -0,0 +1,205 @@
+#---------------------------------------------
+# Compact Position for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import numpy as np
+import pieces as p
+import squares as sq
+
+# A position is one 82-byte buffer of small integers instead of 24 Piece objects with
+# string fields, so copying it is a single buffer copy:
+#   [0:32]   piece on each square (piece index + 1, 0 if empty)
+#   [32]     sentinel for the off-board square (EDGE), so moves never check bounds
+#   [33:57]  square of each piece (OFF_BOARD once captured)
+#   [57:81]  kind of each piece (0 captured, 1 man, 2 king)
+#   [81]     side to move (0 white, 1 black)
+# Piece indices follow the piece list: 0-11 white, 12-23 black, so action_space rows
+# and move arguments are the same as in state.py and main.move_piece.
+
+SQUARES = 0
+LOCATIONS = 33
+KINDS = 57
+PLAYER = 81
+SIZE = 82
+
+EDGE = 255
+CAPTURED = 0
+MAN = 1
+KING = 2
+VALUES = (0, 1, 3)
+COLORS = ('white', 'black')
+
+# Action slots by side and kind (see squares.py)
+SLOTS = ((None, sq.MAN_SLOTS['white'], sq.KING_SLOTS),
+         (None, sq.MAN_SLOTS['black'], sq.KING_SLOTS))
+
+# Whether a square code holds a piece of each side
+OWNED = (tuple(1 <= code <= 12 for code in range(0, 256)),
+         tuple(13 <= code <= 24 for code in range(0, 256)))
+
+
+class Position():
+
+    """Side to move and piece placement in a single bytearray"""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data=None):
+
+        # Args: (1) existing buffer (Default empty board with white to move)
+        if data is None:
+            data = bytearray(SIZE)
+            data[sq.OFF_BOARD] = EDGE
+            data[LOCATIONS:KINDS] = bytes([sq.OFF_BOARD]) * 24
+        self.data = data
+
+
+    def copy(self):
+
+        """Copying the position"""
+
+        # Requires: none
+        # Returns: new Position
+        return Position(bytearray(self.data))
+
+
+    def player(self):
+
+        """Naming the side to move"""
+
+        # Requires: none
+        # Returns: 'white' or 'black'
+        return COLORS[self.data[PLAYER]]
+
+
+    def move(self, piece, action):
+
+        """Performing a move and passing the turn"""
+
+        # Requires: (1) piece index of the side to move (0-11), (2) action (element of action vector)
+        # Returns: void
+        data = self.data
+        side = data[PLAYER]
+        index = piece + 12 * side
+        kind = data[KINDS + index]
+        square = data[LOCATIONS + index]
+        direction, jump = SLOTS[side][kind][action]
+
+        # Remove the jumped piece
+        if jump:
+            target = sq.JUMPS[square][direction]
+            neighbour = sq.NEIGHBOURS[square][direction]
+            captured = data[neighbour] - 1
+            data[neighbour] = 0
+            data[LOCATIONS + captured] = sq.OFF_BOARD
+            data[KINDS + captured] = CAPTURED
+        else:
+            target = sq.NEIGHBOURS[square][direction]
+
+        data[square] = 0
+        data[target] = index + 1
+        data[LOCATIONS + index] = target
+
+        # Men reaching the far rank are promoted
+        if kind == MAN and sq.RANKS[target] == (1 if side else 8):
+            data[KINDS + index] = KING
+
+        data[PLAYER] = 1 - side
+
+
+def from_pieces(piece_list, player):
+    """Building a position from a piece list"""
+
+    # Args: (1) piece list, (2) player to move
+    # Returns: Position
+    position = Position()
+    data = position.data
+    for index, piece in enumerate(piece_list):
+        if piece.is_active:
+            square = sq.square_index(piece.file, piece.rank)
+            data[SQUARES + square] = index + 1
+            data[LOCATIONS + index] = square
+            data[KINDS + index] = MAN if piece.name == 'Piece' else KING
+    data[PLAYER] = COLORS.index(player)
+
+    return position
+
+
+def to_pieces(position):
+    """Building a piece list from a position"""
+
+    # Args: (1) position
+    # Returns: (1) piece list, (2) player to move
+    data = position.data
+    piece_list = []
+    for index in range(0, 24):
+        color = COLORS[index // 12]
+        kind = data[KINDS + index]
+        if kind == CAPTURED:
+            piece = p.Piece(color, 1, 1)
+            piece.remove()
+        else:
+            square = data[LOCATIONS + index]
+            piece = p.Piece(color, sq.FILES[square], sq.RANKS[square])
+            if kind == KING:
+                piece.name = 'King'
+                piece.symbol = 'K'
+                piece.value = 3
+        piece_list.append(piece)
+
+    return piece_list, position.player()
+
+
+def action_space(position):
+    """Determining available moves for the side to move"""
+
+    # Args: (1) position
+    # Returns: 12 x 8 action space (same layout as state.action_space)
+    data = position.data
+    side = data[PLAYER]
+    opponent = OWNED[1 - side]
+    action_space = np.zeros((12, 8))
+
+    for piece in range(0, 12):
+        index = piece + 12 * side
+        kind = data[KINDS + index]
+        if kind == CAPTURED:
+            continue
+        square = data[LOCATIONS + index]
+        neighbours = sq.NEIGHBOURS[square]
+        jumps = sq.JUMPS[square]
+        for slot, (direction, jump) in enumerate(SLOTS[side][kind]):
+            if jump:
+                if opponent[data[neighbours[direction]]] and data[jumps[direction]] == 0:
+                    action_space[piece, slot] = 1
+            elif data[neighbours[direction]] == 0:
+                action_space[piece, slot] = 1
+
+    return action_space
+
+
+def board_state(position):
+    """Configuring inputs for value function network"""
+
+    # Args: (1) position
+    # Returns: 8 x 8 x 2 board state (same layout as state.board_state)
+    data = position.data
+    board = np.zeros((8, 8, 2))
+    for index in range(0, 24):
+        if data[KINDS + index] != CAPTURED:
+            square = data[LOCATIONS + index]
+            board[sq.FILES[square] - 1, sq.RANKS[square] - 1, index // 12] = 1
+
+    return board
+
+
+def points(position):
+    """Calculating point differential for the position"""
+
+    # Args: (1) position
+    # Returns: differential (white points - black points)
+    data = position.data
+    return sum(VALUES[kind] for kind in data[KINDS:KINDS + 12]) - sum(VALUES[kind] for kind in data[KINDS + 12:PLAYER])
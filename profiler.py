@@ -0,0 +1,153 @@
+#---------------------------------------------
+# Self-Play Profiling for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import collections
+import contextlib
+import cProfile
+import time as t
+import json
+import sys
+
+# PhaseTimer accumulates wall time per named phase (move generation, board copies,
+# afterstate encoding, inference, policy, optimizer, checkpoint) and event counters
+# (plies, games, inference calls and rows). Every N steps it writes one JSON line with
+# the totals and derived rates and starts a new window. A disabled timer hands out a
+# shared no-op context, so the instrumentation costs almost nothing when it is off.
+
+NO_OP = contextlib.nullcontext()
+
+
+class PhaseTimer():
+
+    """Per-phase timers and counters reported as JSON lines"""
+
+    def __init__(self, enabled=True, every=10, output=None):
+
+        # Args: (1) collect timings?, (2) steps per report,
+        #       (3) file object for the JSON lines (Default stdout)
+        self.enabled = enabled
+        self.every = every
+        self.output = output
+        self.reset()
+
+
+    def reset(self):
+
+        """Starting a new reporting window"""
+
+        # Requires: none
+        # Returns: void
+        self.seconds = collections.defaultdict(float)
+        self.counts = collections.defaultdict(int)
+        self.window_start = t.perf_counter()
+
+
+    @contextlib.contextmanager
+    def timed(self, name):
+
+        """Adding the time spent inside the block to a phase"""
+
+        start = t.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += t.perf_counter() - start
+
+
+    def phase(self, name):
+
+        """Context manager timing one phase"""
+
+        # Requires: phase name
+        # Returns: context manager (a no-op if disabled)
+        return self.timed(name) if self.enabled else NO_OP
+
+
+    def count(self, name, n=1):
+
+        """Incrementing a counter"""
+
+        # Requires: (1) counter name, (2) increment
+        # Returns: void
+        if self.enabled:
+            self.counts[name] += n
+
+
+    def report(self, step):
+
+        """Summarizing the current window"""
+
+        # Requires: training step
+        # Returns: dictionary of phase seconds and fractions, counters and rates
+        elapsed = t.perf_counter() - self.window_start
+        plies = self.counts['plies']
+        games = self.counts['games']
+        calls = self.counts['inference_calls']
+        return {
+            'step': step,
+            'seconds': elapsed,
+            'phases': dict(self.seconds),
+            'fractions': {name: seconds / elapsed for name, seconds in self.seconds.items()} if elapsed else {},
+            'counts': dict(self.counts),
+            'plies_per_sec': plies / elapsed if elapsed else 0.0,
+            'games_per_sec': games / elapsed if elapsed else 0.0,
+            'rows_per_inference': self.counts['inference_rows'] / calls if calls else 0.0,
+        }
+
+
+    def step(self, step):
+
+        """Writing a report at the end of every reporting window"""
+
+        # Requires: training step just completed
+        # Returns: void
+        if not self.enabled or (step + 1) % self.every != 0:
+            return
+        output = self.output if self.output else sys.stdout
+        output.write(json.dumps(self.report(step)) + "\n")
+        output.flush()
+        self.reset()
+
+
+class StepProfiler():
+
+    """cProfile over a bounded window of training steps"""
+
+    def __init__(self, path, start=1, steps=10):
+
+        # Args: (1) output path for the pstats dump, (2) first profiled step
+        #       (step 0 is skipped by default as warm-up), (3) number of profiled steps
+        self.path = path
+        self.start = start
+        self.stop = start + steps
+        self.profile = None
+
+
+    def step(self, step):
+
+        """Starting or finishing the profile at the window boundaries"""
+
+        # Requires: training step about to run
+        # Returns: void
+        if step == self.start:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        elif step == self.stop:
+            self.close()
+
+
+    def close(self):
+
+        """Writing the profile if one is running"""
+
+        # Requires: none
+        # Returns: void
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.path)
+            print("Profile of steps %d-%d written to %s" % (self.start, self.stop - 1, self.path))
+            self.profile = None
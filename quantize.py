@@ -0,0 +1,267 @@
+#---------------------------------------------
+# Int8 Quantized Inference for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import numpy as np
+import random as r
+import state as s
+import symmetry as sym
+import inference as nf
+import dataset as ds
+import argparse
+
+# Offline tool that quantizes an exported value network (see inference.py) to int8 and
+# reports how closely it follows the float network. Each layer keeps int8 weights with one
+# scale per layer (max |w| / 127). Hidden activations are requantized to int8 with
+# per-layer scales calibrated on stored positions; the 0/1 board features are already
+# exact int8 values. Layer outputs are int32-exact sums rescaled to float, so the biases
+# and the final output stay float.
+#
+# NumPy has no int8 matrix product, so the int8 operands are multiplied as float32:
+# every partial sum is an integer below 2^24 and is exact, so the results are those of an
+# int8 kernel. Saved weights take a quarter of the float32 size, but in NumPy the
+# requantization makes a call slower than inference.ValueNetwork, so neither self-play nor
+# training uses this module; the written .npz and the report are meant for an int8 runtime.
+#
+# compare() reports the prediction error and the greedy move-agreement rate on positions
+# from sample_positions. They are kept apart from the calibration positions, which come
+# from stored self-play positions (the replay buffer or dataset), so the report is not
+# measured on the data the scales were fitted to.
+#   python quantize.py -ld checkpoints/model.npz -ds dataset -o checkpoints/model-int8.npz
+
+LEVELS = 127
+
+
+def quantize_weights(weights):
+    """Quantizing a weight matrix with one scale"""
+
+    # Args: (1) float weight matrix
+    # Returns: (1) int8 weights, (2) scale such that weights ~ scale * int8 weights
+    scale = np.max(np.abs(weights)) / LEVELS
+    if scale == 0:
+        scale = 1.0
+    return np.clip(np.round(weights / scale), -LEVELS, LEVELS).astype(np.int8), np.float32(scale)
+
+
+class QuantizedNetwork():
+
+    """Value network with int8 weights and activations"""
+
+    def __init__(self, weights=None):
+
+        # Args: (1) list of trainable variable values (None to load them later)
+        self.layers = []                # (int8 weights, weight scale, float32 biases)
+        self.activation_scales = []     # Requantization scale of each hidden layer's output
+        self.operands = []              # int8 weights held as float32 for the matrix products
+        if weights is not None:
+            for layer_weights, biases in zip(weights[0::2], weights[1::2]):
+                quantized, scale = quantize_weights(np.asarray(layer_weights, dtype=np.float32))
+                self.add_layer(quantized, scale, np.asarray(biases, dtype=np.float32))
+
+
+    def add_layer(self, weights, scale, biases):
+
+        """Appending a quantized layer"""
+
+        # Requires: (1) int8 weights, (2) weight scale, (3) float32 biases
+        # Returns: void
+        self.layers.append((weights, scale, biases))
+        self.operands.append(weights.astype(np.float32))
+
+
+    def forward(self, board_states, requantize=True):
+
+        """Running the layers"""
+
+        # Requires: (1) board states (any shape with N * 128 entries),
+        #           (2) requantize hidden activations? (False gives the calibration activations)
+        # Returns: (1) [N, 1] expected returns, (2) list of hidden layer outputs
+        activations = np.reshape(board_states, (-1, 128)).astype(np.float32)
+        input_scale = np.float32(1.0)
+        hidden = []
+        for k, (weights, weight_scale, biases) in enumerate(self.layers):
+            outputs = (activations @ self.operands[k]) * (input_scale * weight_scale) + biases
+            if k == len(self.layers) - 1:
+                return outputs, hidden
+            outputs = np.maximum(outputs, 0)
+            hidden.append(outputs)
+            if requantize:
+                input_scale = self.activation_scales[k]
+                activations = np.minimum(np.round(outputs / input_scale), LEVELS)
+            else:
+                activations = outputs
+
+
+    def calibrate(self, board_states, percentile=99.99):
+
+        """Choosing the hidden activation scales from stored positions"""
+
+        # Requires: (1) calibration board states, (2) percentile of each layer's outputs
+        #           mapped to the largest int8 value (clipping rare outliers)
+        # Returns: void
+        predictions, hidden = self.forward(board_states, requantize=False)
+        self.activation_scales = []
+        for outputs in hidden:
+            limit = np.percentile(outputs, percentile)
+            self.activation_scales.append(np.float32(limit / LEVELS if limit > 0 else 1.0))
+
+
+    def predict(self, board_states):
+
+        """Evaluating a batch of board states"""
+
+        # Requires: board states (any shape with N * 128 entries)
+        # Returns: [N, 1] float32 array of expected returns
+        return self.forward(board_states)[0]
+
+
+def save(network, npz_path):
+    """Writing a quantized network to a .npz file"""
+
+    # Args: (1) calibrated QuantizedNetwork, (2) output path
+    # Returns: void
+    arrays = {}
+    for k, (weights, scale, biases) in enumerate(network.layers):
+        arrays['weights_%d' % k] = weights
+        arrays['scale_%d' % k] = scale
+        arrays['biases_%d' % k] = biases
+    arrays['activation_scales'] = np.array(network.activation_scales, dtype=np.float32)
+    np.savez(npz_path, **arrays)
+
+
+def load(npz_path):
+    """Loading a quantized network"""
+
+    # Args: (1) path of a .npz file written by save
+    # Returns: QuantizedNetwork
+    network = QuantizedNetwork()
+    with np.load(npz_path) as arrays:
+        for k in range(0, len(arrays['activation_scales']) + 1):
+            network.add_layer(arrays['weights_%d' % k], np.float32(arrays['scale_%d' % k]), arrays['biases_%d' % k])
+        network.activation_scales = list(arrays['activation_scales'])
+    return network
+
+
+def sample_positions(count, max_plies=60, canonical=False, seed=0):
+    """Collecting positions and their afterstates from random games"""
+
+    # Args: (1) number of positions, (2) maximum random plies before a position,
+    #       (3) afterstates as evaluated in canonical mode?, (4) seed
+    # Returns: list of (afterstates [K, 128], sign) where the greedy move is argmax(sign * value)
+    rng = r.Random(seed)
+    positions = []
+    while len(positions) < count:
+        pieces = s.initialize_pieces()
+        s.attach_board(pieces)
+        player = 'white'
+        for ply in range(0, rng.randrange(max_plies)):
+            legal = np.argwhere(s.action_space(pieces, player) == 1)
+            if len(legal) == 0:
+                break
+            i, j = legal[rng.randrange(len(legal))]
+            pieces[i + (0 if player == 'white' else 12)].move(j, pieces)
+            player = 'black' if player == 'white' else 'white'
+
+        # Afterstates of every legal move, as generate_game evaluates them
+        legal = np.argwhere(s.action_space(pieces, player) == 1)
+        if len(legal) < 2:
+            continue
+        offset = 0 if player == 'white' else 12
+        afterstates = np.zeros((len(legal), 128))
+        for k, (i, j) in enumerate(legal):
+            undo = pieces[i + offset].move(j, pieces)
+            afterstates[k] = np.reshape(pieces[0].board, 128)
+            pieces[i + offset].unmake(undo)
+
+        # White maximizes and black minimizes the value; in canonical mode white's
+        # afterstates are flipped and their values negated
+        if canonical and player == 'white':
+            positions.append((sym.flip_states(afterstates), -1))
+        else:
+            positions.append((afterstates, 1 if player == 'white' else -1))
+    return positions
+
+
+def compare(network, quantized, positions):
+    """Measuring the quantized network against the float network"""
+
+    # Args: (1) float network (anything with predict), (2) QuantizedNetwork,
+    #       (3) positions from sample_positions
+    # Returns: dictionary of mean and maximum absolute prediction error and move-agreement rate
+    # Evaluate every afterstate in one call per network, then split them by position
+    afterstates = np.concatenate([position[0] for position in positions])
+    values = network.predict(afterstates)[:, 0]
+    quantized_values = quantized.predict(afterstates)[:, 0]
+    errors = np.abs(values - quantized_values)
+
+    agreements = 0
+    start = 0
+    for position, sign in positions:
+        end = start + len(position)
+        agreements += int(np.argmax(sign * values[start:end]) == np.argmax(sign * quantized_values[start:end]))
+        start = end
+    return {'positions': len(positions), 'mean_error': float(np.mean(errors)),
+            'max_error': float(np.max(errors)), 'agreement': agreements / len(positions)}
+
+
+def report(summary):
+    """Printing a comparison"""
+
+    print("Int8 vs float on %d positions: mean error %.4f, max error %.4f, move agreement %.3f" %
+          (summary['positions'], summary['mean_error'], summary['max_error'], summary['agreement']))
+
+
+def quantize(weights, calibration_states, positions):
+    """Quantizing and calibrating weights and comparing the result with the float network"""
+
+    # Args: (1) list of trainable variable values, (2) calibration board states (stored
+    #       positions), (3) report positions from sample_positions
+    # Returns: (1) calibrated QuantizedNetwork, (2) comparison from compare
+    quantized = QuantizedNetwork(weights)
+    quantized.calibrate(calibration_states)
+    return quantized, compare(nf.ValueNetwork(weights), quantized, positions)
+
+
+if __name__ == "__main__":
+
+    # ----------------------------------------------------
+    # Quantizing an Exported Network
+    # ----------------------------------------------------
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-ld", "--loaddir", help="Float network exported by inference.py (Default checkpoints/model.npz)", type=str)
+    parser.add_argument("-o", "--output", help="Output .npz file (Default checkpoints/model-int8.npz)", type=str)
+    parser.add_argument("-ds", "--dataset", help="Dataset directory of stored positions to calibrate on (Default afterstates of other random positions)", type=str)
+    parser.add_argument("-cs", "--calibration", help="Stored positions used for calibration (Default 10000)", type=int)
+    parser.add_argument("-n", "--positions", help="Random positions in the accuracy report (Default 1000)", type=int)
+    parser.add_argument("-cn", "--canonical", help="Network was trained in canonical mode? (Default False)", type=bool)
+    parser.add_argument("-th", "--threshold", help="Only write the output if the move agreement reaches this rate (Default 0)", type=float)
+    args = parser.parse_args()
+
+    load_path = args.loaddir if args.loaddir else "checkpoints/model.npz"
+    output = args.output if args.output else "checkpoints/model-int8.npz"
+    calibration_size = args.calibration if args.calibration else 10000
+    num_positions = args.positions if args.positions else 1000
+    canonical = args.canonical if args.canonical else False
+    threshold = args.threshold if args.threshold else 0.0
+
+    with np.load(load_path) as variables:
+        weights = [variables[name] for name in nf.VARIABLES]
+    positions = sample_positions(num_positions, canonical=canonical)
+    if args.dataset:
+        calibration_states = ds.ShardedDataset(args.dataset).sample(calibration_size)[0]
+    else:
+        # Without stored positions, calibrate on a different seed than the report positions
+        print("No dataset given; calibrating on afterstates of other random positions")
+        calibration_states = np.concatenate([afterstates for afterstates, sign in
+                                             sample_positions(calibration_size // 8, canonical=canonical, seed=1)])
+
+    quantized, summary = quantize(weights, calibration_states, positions)
+    report(summary)
+    if summary['agreement'] < threshold:
+        print("Move agreement is below %.3f; nothing written" % threshold)
+    else:
+        save(quantized, output)
+        print("Wrote %s" % output)
@@ -0,0 +1,71 @@
+#---------------------------------------------
+# Experience Replay Buffer for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import numpy as np
+import packing as pk
+
+
+class ReplayBuffer():
+
+    """Fixed-capacity ring buffer of (board state, return) pairs"""
+
+    def __init__(self, capacity, state_size=128, packed=True):
+
+        # Args: (1) maximum number of pairs, (2) flattened board state size,
+        #       (3) store states bit-packed (see packing.py)? Packed states must have
+        #           pieces on dark squares only
+
+        # Storage is allocated once; the oldest pairs are overwritten when full
+        self.capacity = capacity
+        self.packed = packed
+        if packed:
+            self.states = np.zeros((capacity, 2), dtype=np.uint32)
+        else:
+            self.states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.returns = np.zeros(capacity, dtype=np.float32)
+        self.index = 0      # Next slot to write
+        self.size = 0       # Number of valid pairs
+
+
+    def __len__(self):
+        return self.size
+
+
+    def add(self, states, returns):
+
+        """Storing a batch of pairs"""
+
+        # Requires: (1) board states (any shape with N * state_size entries), (2) N returns
+        # Returns: void
+        states = np.reshape(states, (len(returns), -1))
+        returns = np.asarray(returns)
+        if self.packed:
+            states = pk.pack_states(states)
+
+        # Only the newest pairs survive if the batch is larger than the buffer
+        if len(returns) > self.capacity:
+            states = states[-self.capacity:]
+            returns = returns[-self.capacity:]
+
+        # Write with wrap-around
+        slots = (self.index + np.arange(len(returns))) % self.capacity
+        self.states[slots] = states
+        self.returns[slots] = returns
+        self.index = (self.index + len(returns)) % self.capacity
+        self.size = min(self.size + len(returns), self.capacity)
+
+
+    def sample(self, batch_size, unpack=True):
+
+        """Sampling a minibatch uniformly with replacement"""
+
+        # Requires: (1) batch size, (2) expand packed states? (False returns the stored rows)
+        # Returns: (1) batch_size x state_size board states, (2) batch_size returns
+        slots = np.random.randint(0, self.size, size=batch_size)
+        if self.packed and unpack:
+            return pk.unpack_states(self.states[slots]), self.returns[slots]
+        return self.states[slots], self.returns[slots]
@@ -0,0 +1,187 @@
+#---------------------------------------------
+# Alpha-Beta Search for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import numpy as np
+import state as s
+import symmetry as sym
+import time as t
+import math
+
+# Negamax with alpha-beta pruning and iterative deepening. Each iteration searches one
+# ply deeper, trying the previous iteration's principal variation move first, then
+# captures, then other moves. At the frontier every child of a node is encoded in place
+# (move, read the attached board, unmake) and scored in one batched predict call.
+#
+# The value network estimates the return still to come from a position, so a leaf is
+# scored as the material gained since the root plus the network's estimate. Positions
+# without legal moves end the game and are scored by material alone. Scores are from
+# white's side (white maximizes) and negated for black. With canonical, leaves with black
+# to move are evaluated flipped (see symmetry.py).
+#
+# A node or time budget stops the search; the unfinished iteration is discarded and the
+# best move of the last complete iteration is played. Depth 1 always completes.
+
+
+class Searcher():
+
+    """Iterative-deepening alpha-beta searcher with value network leaves"""
+
+    def __init__(self, predict, max_depth=3, max_nodes=0, max_seconds=0, engine='pieces', canonical=False):
+
+        # Args: (1) function mapping [N, 128] board states to [N, 1] returns,
+        #       (2) maximum search depth, (3) node budget (0 for none),
+        #       (4) time budget in seconds (0 for none), (5) move generator,
+        #       (6) network trained on side-to-move positions?
+        self.predict = predict
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.max_seconds = max_seconds
+        self.engine = engine
+        self.canonical = canonical
+
+        # Statistics of the last search
+        self.nodes = 0
+        self.depth = 0
+
+
+    def search(self, pieces, player):
+
+        """Finding the best move for the player to move"""
+
+        # Requires: (1) piece list, (2) player to move
+        # Returns: (1) piece index, (2) move index, (3) score for the player, or None without legal moves
+
+        # Afterstates are read from the board the pieces keep up to date
+        self.pieces = pieces
+        self.board = pieces[0].board if pieces[0].board is not None else s.attach_board(pieces)
+        self.root_points = s.points(pieces)
+
+        self.nodes = 0
+        self.depth = 0
+        self.stopped = False
+        self.start_time = t.perf_counter()
+        self.pv = []
+
+        best = None
+        for depth in range(1, self.max_depth + 1):
+            score, line = self.negamax(player, depth, -math.inf, math.inf, 0, True)
+
+            # Discard an iteration cut short by the budget
+            if self.stopped or not line:
+                break
+            best = (line[0][0], line[0][1], score)
+            self.pv = line
+            self.depth = depth
+
+        return best
+
+
+    def exhausted(self):
+
+        """Checking the node and time budgets"""
+
+        # Requires: none
+        # Returns: True if the search must stop
+        if self.max_nodes and self.nodes >= self.max_nodes:
+            return True
+        if self.max_seconds and t.perf_counter() - self.start_time >= self.max_seconds:
+            return True
+        return False
+
+
+    def ordered_moves(self, player, ply, on_pv):
+
+        """Listing legal moves with the principal variation move first, then captures"""
+
+        # Requires: (1) player to move, (2) distance from the root, (3) node lies on the previous PV?
+        # Returns: list of (piece index, move index)
+        legal = [(i, j) for i, j in np.argwhere(s.action_space(self.pieces, player, engine=self.engine) == 1)]
+
+        # Slots 2-3 (and 6-7 for kings) are jumps; the sort is stable
+        # and the PV move is then moved ahead of them
+        legal.sort(key=lambda action: action[1] % 4 < 2)
+
+        if on_pv and ply < len(self.pv) and self.pv[ply] in legal:
+            legal.remove(self.pv[ply])
+            legal.insert(0, self.pv[ply])
+
+        return legal
+
+
+    def evaluate_children(self, player, moves):
+
+        """Scoring every child of a frontier node in one predict call"""
+
+        # Requires: (1) player to move, (2) legal moves
+        # Returns: array of child scores for the player to move
+        offset = 0 if player == 'white' else 12
+        states = np.zeros((len(moves), 128))
+        material = np.zeros(len(moves))
+        for k, (i, j) in enumerate(moves):
+            undo = self.pieces[i + offset].move(j, self.pieces)
+            states[k] = np.reshape(self.board, 128)
+            material[k] = s.points(self.pieces)
+            self.pieces[i + offset].unmake(undo)
+        self.nodes += len(moves)
+
+        # Children have the opponent to move
+        if self.canonical:
+            values = sym.evaluate(self.predict, states, player == 'white')[:, 0]
+        else:
+            values = self.predict(states)[:, 0]
+
+        sign = 1 if player == 'white' else -1
+        return sign * (values + material - self.root_points)
+
+
+    def negamax(self, player, depth, alpha, beta, ply, on_pv):
+
+        """Searching a node to the given depth"""
+
+        # Requires: (1) player to move, (2) remaining depth, (3) alpha, (4) beta,
+        #           (5) distance from the root, (6) node lies on the previous PV?
+        # Returns: (1) score for the player to move, (2) best line as (piece index, move index) list
+        self.nodes += 1
+        if self.pv and self.exhausted():
+            self.stopped = True
+            return 0, []
+
+        sign = 1 if player == 'white' else -1
+        moves = self.ordered_moves(player, ply, on_pv)
+
+        # No legal moves ends the game: score the material difference only
+        if not moves:
+            return sign * (s.points(self.pieces) - self.root_points), []
+
+        # Frontier: evaluate all children together
+        if depth == 1:
+            scores = self.evaluate_children(player, moves)
+            best = int(np.argmax(scores))
+            return scores[best], [moves[best]]
+
+        offset = 0 if player == 'white' else 12
+        next_player = 'black' if player == 'white' else 'white'
+        best_score = -math.inf
+        best_line = []
+        for i, j in moves:
+            piece = self.pieces[i + offset]
+            undo = piece.move(j, self.pieces)
+            score, line = self.negamax(next_player, depth - 1, -beta, -alpha, ply + 1,
+                                       on_pv and ply < len(self.pv) and (i, j) == self.pv[ply])
+            piece.unmake(undo)
+            if self.stopped:
+                return 0, []
+
+            score = -score
+            if score > best_score:
+                best_score = score
+                best_line = [(i, j)] + line
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        return best_score, best_line
@@ -0,0 +1,279 @@
+#---------------------------------------------
+# Parallel Self-Play for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import multiprocessing as mp
+import numpy as np
+import random as r
+import main as m
+import inference as nf
+import zobrist as z
+
+# Each worker process builds its own copy of the value network once (a TensorFlow
+# graph and session, or a NumPy inference.ValueNetwork, which needs neither; TensorFlow
+# is only imported for a session, so NumPy workers start without it) and
+# receives the trainer's current weights with every task. Games are split
+# into contiguous chunks and the chunks are merged back in submission order,
+# so the feature/label batches come out in the same order for a given seed.
+# Each worker has its own prediction cache; its hits and misses are sent back with every
+# batch and summed in the trainer.
+
+# Worker-side handles for loading weights into the private network
+weight_placeholders = []
+assign_ops = []
+# Worker-side prediction cache (None if disabled)
+cache = None
+
+
+def init_worker(hidden_units, cache_size, numpy_inference=False):
+    """Building a private value network in a worker process"""
+
+    # Args: (1) hidden units per layer, (2) prediction cache entries (0 disables it),
+    #       (3) evaluate positions with the NumPy forward pass instead of a session?
+
+    global weight_placeholders, assign_ops, cache
+
+    cache = z.PredictionCache(cache_size) if cache_size else None
+
+    # generate_game predicts with main.network when it is set; no graph is needed
+    if numpy_inference:
+        m.network = nf.ValueNetwork()
+        return
+
+    import tensorflow as tf
+
+    # generate_game reads inputs, predictions and sess from the main module
+    m.inputs, m.predictions = m.build_value_network(hidden_units)
+
+    weight_placeholders = []
+    assign_ops = []
+    for variable in tf.trainable_variables():
+        placeholder = tf.placeholder(variable.dtype.base_dtype, variable.shape)
+        weight_placeholders.append(placeholder)
+        assign_ops.append(variable.assign(placeholder))
+
+    m.sess = tf.Session()
+
+
+def load_weights(weights):
+    """Loading the trainer's weights into the worker's network"""
+
+    # Args: (1) list of trainable variable values
+    if m.network is not None:
+        m.network.set_weights(weights)
+    else:
+        m.sess.run(assign_ops, feed_dict=dict(zip(weight_placeholders, weights)))
+
+    # Predictions cached under the previous weights are stale
+    if cache is not None:
+        cache.clear()
+
+
+def play_games(task):
+    """Loading weights and playing a chunk of games in a worker process"""
+
+    # Args: (1) task: (weights, seed, generate_game keyword arguments)
+    # Returns: (1) feature batch, (2) label batch, (3) cache hits, (4) cache misses in this chunk
+
+    weights, seed, kwargs = task
+    load_weights(weights)
+
+    # Seed every chunk so results do not depend on which worker ran it
+    r.seed(seed)
+    np.random.seed(seed)
+
+    hits, misses = cache_counts()
+    features, labels = m.generate_game(cache=cache, **kwargs)
+    return (features, labels) + tuple(np.subtract(cache_counts(), (hits, misses)))
+
+
+def cache_counts():
+    """Reading the worker's cache counters"""
+
+    # Returns: (1) hits, (2) misses (0 without a cache)
+    return (cache.hits, cache.misses) if cache is not None else (0, 0)
+
+
+class SelfPlayPool():
+
+    """Process pool that spreads the games of a batch across workers"""
+
+    def __init__(self, workers, hidden_units, cache_size=0, numpy_inference=False):
+
+        """Starting worker processes"""
+
+        # TensorFlow sessions do not survive fork, so workers are spawned
+        self.workers = workers
+        self.hits = 0       # Prediction cache counters summed over the workers
+        self.misses = 0
+        context = mp.get_context('spawn')
+        self.pool = context.Pool(workers, initializer=init_worker,
+                                 initargs=(hidden_units, cache_size, numpy_inference))
+
+
+    def generate_game(self, weights, seed, batch_size, **kwargs):
+
+        """Generating feature and target batches in parallel"""
+
+        # Requires: (1) list of trainable variable values, (2) seed, (3) batch size,
+        #           (4) remaining generate_game keyword arguments
+        # Returns: (1) feature batch, (2) label batch
+
+        # Split games into one contiguous chunk per worker
+        chunks = [len(chunk) for chunk in np.array_split(np.arange(batch_size), self.workers)]
+        tasks = []
+        for k, games in enumerate(chunks):
+            if games > 0:
+                tasks.append((weights, seed * self.workers + k, dict(kwargs, batch_size=games)))
+
+        # Pool.map returns results in task order
+        results = self.pool.map(play_games, tasks)
+
+        feature_batches = np.concatenate([result[0] for result in results])
+        label_batches = np.concatenate([result[1] for result in results])
+        self.hits += sum(int(result[2]) for result in results)
+        self.misses += sum(int(result[3]) for result in results)
+        return feature_batches, label_batches
+
+
+    def close(self):
+
+        """Stopping worker processes"""
+
+        self.pool.close()
+        self.pool.join()
+
+
+# ----------------------------------------------------
+# Actor/Learner Mode
+# ----------------------------------------------------
+# Actors play batches continuously with the newest weights they have received and push
+# them into a bounded queue; a full queue blocks the actors (back-pressure). The learner
+# takes one batch per optimizer step, drops batches played with weights more than
+# max_staleness versions old, and publishes new weights into a shared-memory slot with a
+# version number. Actors copy the slot out whenever its version has changed, so only the
+# latest weights are ever held, and nothing is left in a pipe when the actors are stopped.
+
+
+def split_weights(flat, shapes):
+    """Splitting a flat weight vector into trainable variable values"""
+
+    # Args: (1) flat float32 vector, (2) variable shapes
+    # Returns: list of arrays
+    weights = []
+    start = 0
+    for shape in shapes:
+        size = int(np.prod(shape))
+        weights.append(flat[start:start + size].reshape(shape))
+        start += size
+    return weights
+
+
+def run_actor(actor_id, hidden_units, cache_size, numpy_inference, slot, slot_version, shapes, batches, seed, kwargs):
+    """Playing batches in an actor process until stopped"""
+
+    # Args: (1) actor number, (2) hidden units, (3) prediction cache entries,
+    #       (4) NumPy inference?, (5) shared weight slot, (6) its version,
+    #       (7) variable shapes, (8) batch queue shared with the learner, (9) seed,
+    #       (10) generate_game keyword arguments
+
+    init_worker(hidden_units, cache_size, numpy_inference)
+    r.seed(seed + actor_id)
+    np.random.seed(seed + actor_id)
+
+    version = None
+    while True:
+
+        # Take the newest weights published by the learner (the slot is filled before
+        # the actors start)
+        if slot_version.value != version:
+            with slot.get_lock():
+                version = slot_version.value
+                flat = np.frombuffer(slot.get_obj(), dtype=np.float32).copy()
+            load_weights(split_weights(flat, shapes))
+
+        # Play a batch and hand it to the learner with the cache lookups it made,
+        # waiting while the queue is full
+        hits, misses = cache_counts()
+        features, labels = m.generate_game(cache=cache, **kwargs)
+        hits, misses = np.subtract(cache_counts(), (hits, misses))
+        batches.put((version, features, labels, int(hits), int(misses)))
+
+
+class ActorLearner():
+
+    """Self-play actor processes feeding the learner through a bounded queue"""
+
+    def __init__(self, actors, hidden_units, weights, queue_size, max_staleness, seed=0, cache_size=0,
+                 numpy_inference=False, **kwargs):
+
+        """Starting actor processes with the initial weights"""
+
+        # Requires: (1) number of actors, (2) hidden units, (3) initial trainable variable values,
+        #           (4) batches held in the queue, (5) maximum weight versions a batch may lag,
+        #           (6) seed, (7) prediction cache entries per actor, (8) NumPy inference in actors?,
+        #           (9) generate_game keyword arguments for each batch
+        context = mp.get_context('spawn')
+        self.batches = context.Queue(maxsize=queue_size)
+        # Latest weights, flattened, and the version they were published as
+        shapes = [np.shape(weight) for weight in weights]
+        self.slot = context.Array('f', int(sum(np.prod(shape) for shape in shapes)))
+        self.slot_version = context.Value('i', 0)
+        self.max_staleness = max_staleness
+        self.version = 0
+        self.dropped = 0
+        self.hits = 0       # Prediction cache counters summed over the actors
+        self.misses = 0
+
+        self.publish(weights)
+        self.processes = []
+        for actor in range(0, actors):
+            process = context.Process(target=run_actor, args=(actor, hidden_units, cache_size, numpy_inference,
+                                                              self.slot, self.slot_version, shapes,
+                                                              self.batches, seed, kwargs))
+            process.daemon = True
+            process.start()
+            self.processes.append(process)
+
+
+    def publish(self, weights):
+
+        """Sending new weights to every actor"""
+
+        # Requires: list of trainable variable values
+        # Returns: void
+        self.version += 1
+        flat = np.concatenate([np.ravel(weight) for weight in weights]).astype(np.float32)
+        with self.slot.get_lock():
+            np.frombuffer(self.slot.get_obj(), dtype=np.float32)[:] = flat
+            self.slot_version.value = self.version
+
+
+    def generate_game(self):
+
+        """Taking the next batch that is fresh enough"""
+
+        # Requires: none
+        # Returns: (1) feature batch, (2) label batch
+        while True:
+            version, features, labels, hits, misses = self.batches.get()
+            # Lookups made for dropped batches still count
+            self.hits += hits
+            self.misses += misses
+            if self.version - version <= self.max_staleness:
+                return features, labels
+            self.dropped += 1
+
+
+    def close(self):
+
+        """Stopping actor processes"""
+
+        # Actors may be blocked on a full queue, so they are terminated rather than joined
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
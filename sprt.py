@@ -0,0 +1,166 @@
+#---------------------------------------------
+# Sequential Probability Ratio Test for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import multiprocessing as mp
+import test_bench as tb
+import time as t
+import argparse
+import math
+import os
+
+# Plays a checkpoint against the random policy or another checkpoint (see test_bench.py)
+# until a sequential probability ratio test decides between H0: the Elo difference is
+# elo0 and H1: it is elo1, with false positive rate alpha and false negative rate beta.
+#
+# The log-likelihood ratio uses the trinomial (win/draw/loss) approximation: with mean
+# score s and per-game variance v over N games, LLR = N (s1 - s0) (2s - s0 - s1) / (2v),
+# where s0 and s1 are the expected scores at elo0 and elo1. Outcome classes not seen yet
+# count as half a game so the variance is not zero early on.
+#
+# Games run concurrently, but results are consumed in submission order: a game is only
+# counted once every earlier game is counted. Short games finish first, so counting in
+# completion order would bias the test toward whatever ends games quickly.
+
+
+def expected_score(elo):
+    """Converting an Elo difference to an expected score"""
+
+    # Args: (1) Elo difference
+    # Returns: expected score (win = 1, draw = 1/2)
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class SPRT():
+
+    """Trinomial sequential probability ratio test"""
+
+    def __init__(self, elo0=0.0, elo1=10.0, alpha=0.05, beta=0.05):
+
+        # Args: (1) Elo difference under H0, (2) under H1,
+        #       (3) probability of accepting H1 when H0 holds, (4) of accepting H0 when H1 holds
+        self.score0 = expected_score(elo0)
+        self.score1 = expected_score(elo1)
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.outcomes = []
+        self.counts = {1: 0, 0: 0, -1: 0}
+
+
+    def add(self, outcome):
+
+        """Counting one game"""
+
+        # Requires: outcome (+1 win, 0 draw, -1 loss) for the model
+        # Returns: void
+        self.outcomes.append(outcome)
+        self.counts[outcome] += 1
+
+
+    def llr(self):
+
+        """Computing the log-likelihood ratio of H1 against H0"""
+
+        # Requires: none
+        # Returns: log-likelihood ratio
+        counts = [max(self.counts[outcome], 0.5) for outcome in (1, 0, -1)]
+        games = sum(counts)
+        score = (counts[0] + counts[1] / 2) / games
+        variance = (counts[0] * (1 - score) ** 2 + counts[1] * (0.5 - score) ** 2
+                    + counts[2] * score ** 2) / games
+        return games * (self.score1 - self.score0) * (2 * score - self.score0 - self.score1) / (2 * variance)
+
+
+    def status(self):
+
+        """Checking whether the test has decided"""
+
+        # Requires: none
+        # Returns: 'H1' (accept elo1), 'H0' (accept elo0) or None to continue
+        llr = self.llr()
+        if llr >= self.upper:
+            return 'H1'
+        if llr <= self.lower:
+            return 'H0'
+        return None
+
+
+if __name__ == "__main__":
+
+    # ----------------------------------------------------
+    # Parsing Console Arguments
+    # ----------------------------------------------------
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-e0", "--elo0", help="Elo difference under H0 (Default 0)", type=float)
+    parser.add_argument("-e1", "--elo1", help="Elo difference under H1 (Default 10)", type=float)
+    parser.add_argument("-a", "--alpha", help="False positive rate (Default 0.05)", type=float)
+    parser.add_argument("-b", "--beta", help="False negative rate (Default 0.05)", type=float)
+    parser.add_argument("-n", "--maxgames", help="Stop undecided after N games (Default 20000)", type=int)
+    parser.add_argument("-w", "--workers", help="Worker processes (Default number of CPUs)", type=int)
+    parser.add_argument("-u", "--hidunits", help="Number of hidden units (Default 100)", type=int)
+    parser.add_argument("-m", "--maxmoves", help="Maximum moves per game (Default 100)", type=int)
+    parser.add_argument("-op", "--openings", help="Random opening plies (Default 2)", type=int)
+    parser.add_argument("-o", "--opponent", help="Opponent: random, a checkpoint path or an exported .npz (Default random)", type=str)
+    parser.add_argument("-dp", "--depth", help="Alpha-beta depth for network moves, 0 for one-ply greedy (Default 0)", type=int)
+    parser.add_argument("-mc", "--simulations", help="MCTS simulations for network moves, 0 to disable (Default 0)", type=int)
+    parser.add_argument("-cn", "--canonical", help="Models were trained in canonical mode? (Default False)", type=bool)
+    parser.add_argument("-s", "--seed", help="Seed of the first game (Default 0)", type=int)
+    parser.add_argument("-ld", "--loaddir", help="Load path of the model, or an exported .npz (Default checkpoints/model)", type=str)
+    args = parser.parse_args()
+
+    elo0 = args.elo0 if args.elo0 is not None else 0.0
+    elo1 = args.elo1 if args.elo1 is not None else 10.0
+    alpha = args.alpha if args.alpha else 0.05
+    beta = args.beta if args.beta else 0.05
+    max_games = args.maxgames if args.maxgames else 20000
+    workers = args.workers if args.workers else os.cpu_count()
+    hidden_units = args.hidunits if args.hidunits else 100
+    max_moves = args.maxmoves if args.maxmoves else 100
+    opening_plies = args.openings if args.openings is not None else 2
+    opponent = args.opponent if args.opponent else 'random'
+    search_depth = args.depth if args.depth else 0
+    simulations = args.simulations if args.simulations else 0
+    canonical = args.canonical if args.canonical else False
+    seed = args.seed if args.seed else 0
+    load_path = args.loaddir if args.loaddir else "checkpoints/model"
+
+    # ----------------------------------------------------
+    # Play Games Until the Test Decides
+    # ----------------------------------------------------
+    model_spec = (load_path, hidden_units, search_depth, simulations, canonical)
+    opponent_spec = 'random' if opponent == 'random' else (opponent, hidden_units, search_depth, simulations, canonical)
+    model_spec, opponent_spec = tb.resolve_players(model_spec, opponent_spec)
+    tasks = ((game, seed + game, max_moves, opening_plies, False, False, True) for game in range(0, max_games))
+
+    test = SPRT(elo0, elo1, alpha, beta)
+    decision = None
+    start_time = t.time()
+
+    context = mp.get_context('spawn')
+    pool = context.Pool(workers, initializer=tb.init_worker, initargs=(model_spec, opponent_spec))
+
+    # imap yields results in submission order while the workers keep playing ahead
+    for outcome in pool.imap(tb.play_game, tasks):
+        test.add(outcome)
+        decision = test.status()
+        if len(test.outcomes) % 20 == 0:
+            print("Games: %d   LLR: %.2f (%.2f, %.2f)" % (len(test.outcomes), test.llr(), test.lower, test.upper))
+        if decision:
+            break
+
+    # Games still running are no longer needed
+    pool.terminate()
+    pool.join()
+
+    print("\nPlayed %d games in %.1f seconds" % (len(test.outcomes), t.time() - start_time))
+    print("LLR: %.2f (%.2f, %.2f)" % (test.llr(), test.lower, test.upper))
+    if decision == 'H1':
+        print("H1 accepted: Elo difference %.0f is favoured over %.0f" % (elo1, elo0))
+    elif decision == 'H0':
+        print("H0 accepted: Elo difference %.0f is favoured over %.0f" % (elo0, elo1))
+    else:
+        print("No decision after %d games" % max_games)
+    tb.report(tb.summarize(test.outcomes))
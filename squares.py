@@ -0,0 +1,76 @@
+#---------------------------------------------
+# Square Lookup Tables for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+
+# The 32 playable (dark) squares are numbered 0-31, four per rank:
+# a1 c1 e1 g1 = 0 1 2 3, b2 d2 f2 h2 = 4 5 6 7, ... b8 d8 f8 h8 = 28 29 30 31
+# Tables are built once at import so move generation never checks board bounds.
+
+# Directions as (file step, rank step)
+UP_LEFT = 0
+UP_RIGHT = 1
+DOWN_LEFT = 2
+DOWN_RIGHT = 3
+DIRECTIONS = [(-1, 1), (1, 1), (-1, -1), (1, -1)]
+
+# Square number used for moves that leave the board
+OFF_BOARD = 32
+
+# Entry of a square index (see state.attach_board) at OFF_BOARD, so moves off the board
+# are blocked like moves onto an occupied square
+EDGE = 'edge'
+
+# Action vector slots for each piece type (see pieces.py for move glossary)
+# Each entry is (direction, jump?)
+MAN_SLOTS = {'white': ((UP_LEFT, False), (UP_RIGHT, False), (UP_LEFT, True), (UP_RIGHT, True)),
+             'black': ((DOWN_LEFT, False), (DOWN_RIGHT, False), (DOWN_LEFT, True), (DOWN_RIGHT, True))}
+KING_SLOTS = MAN_SLOTS['white'] + MAN_SLOTS['black']
+
+
+def square_index(file, rank):
+    """Converting file and rank (1-8) to a square number (0-31)"""
+
+    # Args: (1) file, (2) rank
+    # Returns: square number
+    return (rank - 1) * 4 + (file - 1) // 2
+
+
+def build_tables():
+    """Building square coordinate, neighbour and jump tables"""
+
+    # Returns: (1) file and (2) rank of each square, (3) neighbour and (4) jump-landing
+    #          square of each square in each direction (OFF_BOARD if it leaves the board)
+
+    files = []
+    ranks = []
+    neighbours = []
+    jumps = []
+
+    for square in range(0, 32):
+        rank = square // 4 + 1
+        file = 2 * (square % 4) + 1 + (rank - 1) % 2
+        files.append(file)
+        ranks.append(rank)
+
+        square_neighbours = []
+        square_jumps = []
+        for file_step, rank_step in DIRECTIONS:
+            if 0 < file + file_step < 9 and 0 < rank + rank_step < 9:
+                square_neighbours.append(square_index(file + file_step, rank + rank_step))
+            else:
+                square_neighbours.append(OFF_BOARD)
+            if 0 < file + 2 * file_step < 9 and 0 < rank + 2 * rank_step < 9:
+                square_jumps.append(square_index(file + 2 * file_step, rank + 2 * rank_step))
+            else:
+                square_jumps.append(OFF_BOARD)
+        neighbours.append(tuple(square_neighbours))
+        jumps.append(tuple(square_jumps))
+
+    return files, ranks, neighbours, jumps
+
+
+FILES, RANKS, NEIGHBOURS, JUMPS = build_tables()
@@ -5,9 +5,11 @@
 # Last Edited: 2021
 # University of Wisconsin - Madison
 # ----------------------------------------------------
-import tensorflow as tf
 import numpy as np
 import pieces as p
+import bitboard as b
+import position as po
+import squares as sq
 import random as r
 import state as s
 import time as t
@@ -83,25 +85,58 @@ def board_state(piece_list):
 
     # The M layers each represent a different piece group. The order of is as follows:
     # 0: White Pieces
-    # 0: Black Pieces
+    # 1: Black Pieces
     # Note that the number of pieces in each category may change upon piece promotion or removal
     # (hence the code below will remain general).
 
     # Fill board state with pieces
     for piece in piece_list:
-        # Place active white pawns in plane 0 and continue to next piece
+        # Place active white pieces in plane 0 and continue to next piece
         if piece.is_active and piece.color == 'white':
             # print(piece.name)
             board[piece.file - 1, piece.rank - 1, 0] = 1
 
-        # Place active white knights in plane 1 and continue to next piece
-        elif piece.is_active and piece.color == 'white':
+        # Place active black pieces in plane 1 and continue to next piece
+        elif piece.is_active and piece.color == 'black':
             board[piece.file - 1, piece.rank - 1, 1] = 1
 
     # Return board state
     return board
 
 
+def attach_board(piece_list):
+    """Attaching a board tensor and square index that pieces keep up to date"""
+
+    # Args: (1) piece list
+    # Returns: 8 x 8 x 2 board state shared by all pieces
+
+    # Piece.move, Piece.unmake and Piece.remove write only the squares they change,
+    # so the attached board always equals board_state(piece_list) without a rebuild.
+    # The square index maps each square number (see squares.py) to the piece on it, so
+    # move generation and capture resolution are lookups instead of piece list scans.
+    # Positions edited directly (file/rank assignment) must be attached again.
+    board = board_state(piece_list)
+    squares = square_index(piece_list)
+    for piece in piece_list:
+        piece.board = board
+        piece.squares = squares
+
+    # Return board state
+    return board
+
+
+def square_index(piece_list):
+    """Mapping each square to the piece on it"""
+
+    # Args: (1) piece list
+    # Returns: list of 33 entries: the active piece on each square or None, then squares.EDGE
+    squares = [None] * 32 + [sq.EDGE]
+    for piece in piece_list:
+        if piece.is_active:
+            squares[sq.square_index(piece.file, piece.rank)] = piece
+    return squares
+
+
 def visualize_state(piece_list):
     """Visualizing board in terminal"""
 
@@ -133,10 +168,12 @@ def visualize_state(piece_list):
     return visualization
 
 
-def action_space(piece_list, player):
+def action_space(piece_list, player, engine='pieces'):
     """Determining available moves for evaluation"""
 
     # Args: (1) piece list, (2) player color
+    #       (3) engine: 'pieces' to query each Piece object, 'bitboard' to use bitboard.py,
+    #           'position' to use a compact position built from the list (position.py)
 
     # The output is a P x 8 matrix where P is the number of pieces and 8 is the maximum
     # possible number of moves for any piece. For pieces which have less than  possible
@@ -145,6 +182,12 @@ def action_space(piece_list, player):
 
     # See pieces.py for move glossary
 
+    # The bitboard engine produces the same matrix without scanning the piece list per square
+    if engine == 'bitboard':
+        return b.action_space(piece_list, player)
+    if engine == 'position':
+        return po.action_space(po.from_pieces(piece_list, player))
+
     # Initializing action space with dimensions P x 8
     action_space = np.zeros((12, 8))
 
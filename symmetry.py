@@ -0,0 +1,48 @@
+#---------------------------------------------
+# Board Symmetries for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import numpy as np
+
+# Turning the board 180 degrees and swapping colours gives the same game with the sides
+# exchanged: dark squares stay dark, white's men move up the board again, and the point
+# differential changes sign. In canonical mode every position is evaluated and stored
+# from the side to move's point of view: positions with black to move are flipped and
+# their values negated, so the network, the prediction cache and the training data see
+# one kind of position instead of two.
+#
+# This is the only symmetry of the game: mirroring files (a <-> h) moves every piece
+# onto the light squares, which never occur in play.
+
+
+def flip_states(states):
+    """Rotating boards 180 degrees and swapping colours"""
+
+    # Args: (1) board states (any shape with N * 128 entries, laid out as 8 x 8 x 2)
+    # Returns: flipped board states in the same shape
+    boards = np.reshape(states, (-1, 8, 8, 2))
+    return np.reshape(boards[:, ::-1, ::-1, ::-1], np.shape(states))
+
+
+def canonical_states(states, black_to_move):
+    """Flipping the boards that have black to move"""
+
+    # Args: (1) N x 128 board states, (2) N booleans (or one for all boards)
+    # Returns: N x 128 board states seen from the side to move
+    states = np.reshape(states, (-1, 128))
+    black_to_move = np.broadcast_to(black_to_move, (len(states),))
+    return np.where(black_to_move[:, None], flip_states(states), states)
+
+
+def evaluate(predict, states, black_to_move):
+    """Evaluating boards in the side-to-move frame"""
+
+    # Args: (1) function mapping [N, 128] board states to [N, 1] values for the side to move,
+    #       (2) N x 128 board states, (3) N booleans (or one for all boards)
+    # Returns: [N, 1] values from white's side
+    states = canonical_states(states, black_to_move)
+    signs = np.where(np.broadcast_to(black_to_move, (len(states),)), -1.0, 1.0)
+    return signs[:, None] * predict(states)
@@ -1,314 +1,340 @@
 # ----------------------------------------------------
-# Test Bench for Chess AI v1.0.2
+# Test Bench for Checkers AI v1.1.0
 # Created By: Adam Labiosa and Luke Selberg
 # Inspration From: Jonathan Zia
-# Last Edited: 2020
+# Last Edited: 2021
 # University of Wisconsin - Madison
 # ----------------------------------------------------
-import tensorflow as tf
 import numpy as np
-import pieces as p
+import multiprocessing as mp
 import random as r
 import state as s
+import main as m
+import search as sr
+import mcts as mc
+import symmetry as sym
+import inference as nf
 import time as t
-import copy as c
+import argparse
 import math
 import os
 
-# This program compares the performance of the specified trained model versus
-# a second model for validation purposes. The program calculates wins/losses
-# of the trained model versus a model that follows a random policy.
+# This program compares the performance of a trained model against the random policy
+# or against a second trained model. Games are spread over a pool of worker processes,
+# each of which loads the players once. The model alternates colours between games, and
+# the outcomes (+1 win, 0 draw, -1 loss for the model, decided by the final point
+# differential) are reported as W/D/L with confidence intervals and written in one write.
 
 # ----------------------------------------------------
 # User-Defined Constants
 # ----------------------------------------------------
-# Value Function Approximator Training
+# Value Function Approximator
 NUM_TESTING	= 100		# Number of testing steps
 HIDDEN_UNITS = 100		# Number of hidden units
-BATCH_SIZE = 5			# Batch size
+BATCH_SIZE = 5			# Games per testing step
 
 # Simulation Parameters
 MAX_MOVES = 100			# Maximum number of moves
-EPSILON = 0.0			# Defining epsilon for e-greedy policy (0 for testing -> greedy policy)
+OPENING_PLIES = 2		# Random plies played before the players take over, so games differ
 
-# Load File
-LOAD_FILE = True 		# Load trained model from saved checkpoint (True for testing)
-VISUALIZE = True		# Select True to visualize games and False to suppress game output
-PRINT = True			# Select True to print moves as text and False to suppress printing
+# Output
+VISUALIZE = False		# Select True to visualize games and False to suppress game output
+PRINT = False			# Select True to print moves as text and False to suppress printing
 ALGEBRAIC = True		# Specify long algebraic notation (True) or descriptive text (False)
 
 
 # ----------------------------------------------------
-# Data Paths
+# Players
 # ----------------------------------------------------
-# Specify filenames
-# Root directory:
-dir_name = "D:\\"
-with tf.name_scope("Model_Data"):		# Model save/load paths
-	load_path = os.path.join(dir_name, "checkpoints/model")			# Model load path
-with tf.name_scope("Filewriter_Data"):	# Filewriter save path
-	filewriter_path = os.path.join(dir_name, "output")
-with tf.name_scope("Output_Data"):		# Output data filenames (.txt)
-	# These .txt files will contain loss data for Matlab analysis
-	outcome_file = os.path.join(dir_name, "outcomes.txt")
+class RandomPlayer():
 
+	"""Player choosing uniformly among legal moves"""
 
-# ----------------------------------------------------
-# User-Defined Methods
-# ----------------------------------------------------
-def initialize_board(random=False, keep_prob=1.0):
-	"""
-	Initialize Game Board
-	Returns: Game board state parameters
-	"""
-	# Initialize board pieces
-	pieces = s.initialize_pieces(random=random,keep_prob=keep_prob)
-	# Initialize state space 
-	board_state = s.board_state(pieces)
-	# Initialize current player:
-	if random:
-		if r.randint(0,1) == 1:
-			player = 'white'
-		else:
-			player = 'black'
-	else:
-		player = 'white'
-	# Initialize move counter:
-	move = 0
-
-	# Return values
-	return pieces, board_state, player, move
-
-def visualize_board(pieces, player, move):
-	"""
-	Visualize Game Board
-	Returns: Void
-	"""
-	print("\nCurrent Board at Move " + str(move) + " for Player " + player)
-	print(s.visualize_state(pieces))
-
-def move_piece(piece,move_index,player,pieces,switch_player=False,print_move=False,algebraic=True):
-	"""
-	Perform specified move
-	Returns: Void
-	"""
-	if player == 'white':
-		pieces[piece].move(move_index,pieces,print_move=print_move,algebraic=algebraic)
-	else:
-		pieces[piece+16].move(move_index,pieces,print_move=print_move,algebraic=algebraic)
+	def new_game(self):
+		pass
+
+	def advance(self, piece_index, move_index):
+		pass
+
+	def choose(self, pieces, player, legal_moves):
 
-	if switch_player:
-		if player == 'white':
-			player = 'black'
+		"""Choosing a move"""
+
+		# Requires: (1) piece list, (2) player to move, (3) legal (piece index, move index) pairs
+		# Returns: (piece index, move index)
+		return legal_moves[r.randrange(len(legal_moves))]
+
+
+class NetworkPlayer():
+
+	"""Player choosing moves with a trained value network"""
+
+	def __init__(self, load_path, hidden_units, search_depth=0, simulations=0, canonical=False):
+
+		"""Loading the checkpoint into a private graph, or exported weights into NumPy"""
+
+		# Args: (1) checkpoint path or .npz file exported by inference.py, (2) hidden units,
+		#		(3) alpha-beta depth (0 for one-ply greedy), (4) MCTS simulations per move (0 to disable),
+		#		(5) network trained in canonical mode?
+		self.network = None
+		if load_path.endswith('.npz'):
+			self.network = nf.load(load_path)
 		else:
-			player = 'white'
-		return player
-
-def generate_outcome(batch_size,max_moves,epsilon,visualize,print_move,algebraic):
-	"""
-	Generating feature and target batches
-	Returns: (1) feature batch, (2) label batch, (3) visualize board?, (4) print move?, (5) print algebraic notation?
-	"""
-
-	# Generates training data based on batches of full-depth Monte-Carlo simulations
-	# performing epsilon-greedy policy evalutaion.
-
-	# Initialize placeholder for outcome batch
-	outcome_batch = []
-
-	# Loop through batch steps
-	for batch_step in range(0,batch_size):
-
-		# Print beginning of game notification for visualization
-		if visualize or print_move:
-			print("\n----------BEGIN GAME----------")
-
-		# ----------------------------------------------------
-		# Initialize Board State
-		# ----------------------------------------------------
-		# Create placeholders for board states and return for each state
-		all_states = []
-		all_returns = []
-
-		# Generating board parameters
-		pieces, initial_state, player, move = initialize_board(random=False, keep_prob=1.0)
-		point_diff_0 = s.points(pieces)
-
-
-		# ----------------------------------------------------
-		# Monte Carlo Simulations
-		# ----------------------------------------------------
-		# Run Monte Carlo Simulation until terminal event(s):
-		# Terminal events: Kings.is_active == False or move_counter > MAX_MOVES
-		while pieces[4].is_active and pieces[28].is_active and move < max_moves:
-
-			# Obtain board state
-			if move == 0:
-				board_state = initial_state
-			else:
-				board_state = s.board_state(pieces)
-
-			# Visualize board state
-			if visualize:
-				visualize_board(pieces,player,move)
-
-			# Obtain current point differential
-			net_diff = s.points(pieces) - point_diff_0
-			point_diff_0 = s.points(pieces)
-			
-			# Append initial board state to all_states
-			all_states.append(board_state)
-			# Add net_diff to all existing returns
-			for i in range(0,len(all_returns)):
-				all_returns[i] += net_diff
-			# Append 0 to end of all_returns representing return for current state
-			all_returns.append(0)
-
-			# Obtain action space
-			action_space = s.action_space(pieces,player)
-
-
-			# ----------------------------------------------------
-			# Value Function Approximation
-			# ----------------------------------------------------
-			# For each action in the action space, obtain subsequent board space
-			# and calculate estimated return with the partially-trained approximator
-
-			# Create placeholder for expected return values
-			return_array = np.zeros((16,56))
-
-			# For each possible move...
-			for i in range(0,16):
-				for j in range(0,56):
-					# If the move is legal...
-					if action_space[i,j] == 1:
-
-						# Perform move and obtain temporary board state
-						temp_pieces = c.deepcopy(pieces)				# Reset temporary pieces variable
-						move_piece(i,j,player,temp_pieces)				# Perform temporary move
-						temp_board_state = s.board_state(temp_pieces)	# Obtain temporary state
-
-						# With temporary state, calculate expected return
-						expected_return = sess.run(predictions, feed_dict={inputs: np.reshape(temp_board_state,(1,768))})
-						# Write estimated return to return_array
-						return_array[i,j] = expected_return
-
-
-			# ----------------------------------------------------
-			# Policy
-			# ----------------------------------------------------
-			# Player white chooses greedy policy, player black chooses random policy
-			# For player black, choose a random action
-			if player == 'black':
-				while True:
-					# If the action is valid...
-					piece_index = r.randint(0,15)
-					move_index = r.randint(0,55)
-					if return_array[piece_index,move_index] != 0:
-						# Perform move and update player
-						player = move_piece(piece_index,move_index,player,pieces,switch_player=True,print_move=print_move,algebraic=algebraic)
-						break
-			# Else, act greedy w.r.t. expected return
-			else:
-				# Identify indices of maximum return (white) or minimum return (black)
-				move_choice = np.nonzero(return_array.max() == return_array)
-				piece_index = move_choice[0][0]
-				move_index = move_choice[1][0]
-				# Perform move and update player
-				player = move_piece(piece_index,move_index,player,pieces,switch_player=True,print_move=print_move,algebraic=algebraic)
-
-			# Increment move counter
-			move += 1
-
-		# Print end of game notification for visualization
-		if visualize or print_move:
-			print("----------END OF GAME----------")
-
-		# Append outcome
-		# If player white won the game...
-		if all_returns[0] > 0:
-			outcome_batch.append(1)		# Return 1
-		# Else, for a draw...
-		elif all_returns[0] == 0:
-			outcome_batch.append(0)		# Return 0 
-		# Else, if player black won the game...
+			# Imported here so that workers playing exported weights start without TensorFlow
+			import tensorflow as tf
+			import checkpoint as ck
+
+			graph = tf.Graph()
+			with graph.as_default():
+				self.inputs, self.predictions = m.build_value_network(hidden_units)
+				saver = tf.train.Saver()
+			self.sess = tf.Session(graph=graph)
+			saver.restore(self.sess, ck.resolve(load_path))
+
+		self.canonical = canonical
+		self.searcher = sr.Searcher(self.predict, max_depth=search_depth, canonical=canonical) if search_depth else None
+		self.tree = mc.MCTS(self.predict, simulations=simulations, canonical=canonical) if simulations else None
+
+	def predict(self, board_states):
+
+		"""Evaluating a batch of board states"""
+
+		if self.network is not None:
+			return self.network.predict(board_states)
+		return self.sess.run(self.predictions, feed_dict={self.inputs: np.reshape(board_states, (-1, 128))})
+
+	def new_game(self):
+		if self.tree is not None:
+			self.tree.reset()
+
+	def advance(self, piece_index, move_index):
+		if self.tree is not None:
+			self.tree.advance(piece_index, move_index)
+
+	def choose(self, pieces, player, legal_moves):
+
+		"""Choosing a move"""
+
+		# Requires: (1) piece list, (2) player to move, (3) legal (piece index, move index) pairs
+		# Returns: (piece index, move index)
+		if self.tree is not None:
+			return self.tree.search(pieces, player)[:2]
+		if self.searcher is not None:
+			return self.searcher.search(pieces, player)[:2]
+
+		# One-ply greedy: white maximizes and black minimizes the afterstate value
+		board_states = np.zeros((len(legal_moves), 128))
+		for k, (i, j) in enumerate(legal_moves):
+			undo = m.move_piece(i, j, player, pieces)
+			board_states[k] = np.reshape(pieces[0].board, 128)
+			m.unmake_move(i, player, pieces, undo)
+		if self.canonical:
+			values = sym.evaluate(self.predict, board_states, player == 'white')[:, 0]
 		else:
-			outcome_batch.append(-1)	# Return -1
-
-	# Return outcome batch
-	outcome_batch = np.array(outcome_batch)
-	return outcome_batch
+			values = self.predict(board_states)[:, 0]
+		sign = 1 if player == 'white' else -1
+		return legal_moves[int(np.argmax(sign * values))]
 
 
 # ----------------------------------------------------
-# Importing Session Parameters
+# User-Defined Methods
 # ----------------------------------------------------
-# Create placeholders for inputs and target values
-# Input dimensions: 8 x 8 x 12
-# Target dimensions: 1 x 1
-inputs = tf.placeholder(tf.float32,[None,768],name='Inputs')
-targets = tf.placeholder(tf.float32,shape=(None,1),name='Targets')
+# Worker-side players: [model, opponent]
+players = []
 
 
-# ----------------------------------------------------
-# Implementing Feedforward NN
-# ----------------------------------------------------
-# First fully-connected layer
-hidden1 = tf.contrib.layers.fully_connected(inputs,num_outputs=HIDDEN_UNITS)
+def make_player(spec):
+	"""Building a player from its description"""
 
-# Second fully-connected layer
-hidden2 = tf.contrib.layers.fully_connected(hidden1,num_outputs=HIDDEN_UNITS)
+	# Args: (1) 'random' or (checkpoint path, hidden units, search depth, simulations, canonical)
+	# Returns: player
+	if spec == 'random':
+		return RandomPlayer()
+	return NetworkPlayer(*spec)
 
-# Output layer
-predictions = tf.contrib.layers.fully_connected(hidden2,num_outputs=1,activation_fn=None)
 
+def resolve_players(model_spec, opponent_spec):
+	"""Resolving both players' checkpoints once, before the workers load them"""
 
-# ----------------------------------------------------
-# Run Session
-# ----------------------------------------------------
-saver = tf.train.Saver()	# Instantiate Saver class
-outcomes = []				# Initialize placeholder for outcomes
-with tf.Session() as sess:
+	# Args: (1) model description, (2) opponent description (see make_player)
+	# Returns: both descriptions with checkpoint paths resolved as in checkpoint.resolve
+	specs = []
+	for name, spec in (('Model', model_spec), ('Opponent', opponent_spec)):
+		if spec != 'random' and not spec[0].endswith('.npz'):
+			import checkpoint as ck
+			spec = (ck.resolve(spec[0]),) + tuple(spec[1:])
+		print("%s: %s" % (name, spec if spec == 'random' else spec[0]))
+		specs.append(spec)
 
-	# Create Tensorboard graph
-	#writer = tf.summary.FileWriter(filewriter_path, sess.graph)
-	#merged = tf.summary.merge_all()
+	# A save path and a checkpoint in the same directory can resolve to the same files
+	if 'random' not in specs and os.path.abspath(specs[0][0]) == os.path.abspath(specs[1][0]):
+		raise ValueError("The model and the opponent are the same checkpoint: " + specs[0][0])
+	return specs
 
-	# Restore saved session
-	saver.restore(sess, load_path)
 
-	# Obtain start time
-	start_time = t.time()
+def init_worker(model_spec, opponent_spec):
+	"""Loading both players in a worker process"""
+
+	global players
+	players = [make_player(model_spec), make_player(opponent_spec)]
+
 
-	# For each training step, generate a random board
-	for step in range(0,NUM_TESTING):
+def play_game(task):
+	"""Playing one game between the model and the opponent"""
 
-		# Run game and determine outcome
-		outcome = generate_outcome(batch_size=BATCH_SIZE,max_moves=MAX_MOVES,epsilon=EPSILON,visualize=VISUALIZE,print_move=PRINT,algebraic=ALGEBRAIC)
-		outcomes.append(outcome)
+	# Args: (1) task: (game number, seed, maximum moves, opening plies, visualize?, print moves?, algebraic?)
+	# Returns: outcome for the model (+1 win, 0 draw, -1 loss)
+	game, seed, max_moves, opening_plies, visualize, print_move, algebraic = task
+	r.seed(seed)
 
+	# The model plays white in even games and black in odd games
+	model_color = 'white' if game % 2 == 0 else 'black'
+	sides = {model_color: players[0], ('black' if model_color == 'white' else 'white'): players[1]}
+	for side in players:
+		side.new_game()
 
-		# Conditional statement for calculating time remaining and percent completion
-		if step % 1 == 0:
+	pieces = s.initialize_pieces()
+	s.attach_board(pieces)
+	player = 'white'
 
-			# Report percent completion
-			p_completion = 100*step/NUM_TESTING
-			print("\nPercent Completion: %.3f%%" % p_completion)
+	if visualize or print_move:
+		print("\n----------BEGIN GAME %d (model plays %s)----------" % (game, model_color))
 
-			# Print time remaining
-			avg_elapsed_time = (t.time() - start_time)/(step+1)
-			sec_remaining = avg_elapsed_time*(NUM_TESTING-step)
-			min_remaining = round(sec_remaining/60)
-			print("Time Remaining: %d minutes" % min_remaining)
+	for move in range(0, max_moves):
 
-			# Print mean outcome
-			print(outcome)
-			print("Mean Outcome: %.3f" % np.mean(outcomes))
+		# Games end when either side has no pieces or no legal moves
+		legal_moves = [(i, j) for i, j in np.argwhere(s.action_space(pieces, player) == 1)]
+		if not legal_moves:
+			break
+
+		if visualize:
+			m.visualize_board(pieces, player, move)
+
+		if move < opening_plies:
+			piece_index, move_index = legal_moves[r.randrange(len(legal_moves))]
+		else:
+			piece_index, move_index = sides[player].choose(pieces, player, legal_moves)
+
+		player = m.move_piece(piece_index, move_index, player, pieces,
+							  switch_player=True, print_move=print_move, algebraic=algebraic)
+		for side in players:
+			side.advance(piece_index, move_index)
+
+	if visualize or print_move:
+		print("----------END OF GAME----------")
+
+	# Outcome from the final point differential, seen from the model's side
+	differential = s.points(pieces) * (1 if model_color == 'white' else -1)
+	return int(np.sign(differential))
+
+
+def summarize(outcomes):
+	"""Computing W/D/L with 95% confidence intervals"""
+
+	# Args: (1) outcomes (+1, 0, -1) for the model
+	# Returns: dictionary of counts, score, score interval and Elo difference interval
+	outcomes = np.asarray(outcomes)
+	n = len(outcomes)
+	wins = int(np.sum(outcomes == 1))
+	draws = int(np.sum(outcomes == 0))
+	losses = int(np.sum(outcomes == -1))
+
+	# Score (win = 1, draw = 1/2) with a Wilson interval, which stays sensible when every
+	# game is won or lost; treating the score as a proportion overstates the variance when
+	# there are draws, so the interval is conservative
+	score = np.mean((outcomes + 1) / 2)
+	z = 1.96
+	center = (score + z * z / (2 * n)) / (1 + z * z / n)
+	margin = z * math.sqrt(score * (1 - score) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+	low = max(center - margin, 0.0)
+	high = min(center + margin, 1.0)
+
+	def elo(p):
+		if p <= 0:
+			return -math.inf
+		if p >= 1:
+			return math.inf
+		return -400 * math.log10(1 / p - 1)
+
+	return {'games': n, 'wins': wins, 'draws': draws, 'losses': losses,
+			'score': score, 'score_low': low, 'score_high': high,
+			'elo': elo(score), 'elo_low': elo(low), 'elo_high': elo(high)}
+
+
+def report(summary):
+	"""Printing a summary"""
+
+	print("\nGames: %d   W/D/L: %d/%d/%d" % (summary['games'], summary['wins'], summary['draws'], summary['losses']))
+	print("Score: %.3f (95%% CI %.3f - %.3f)" % (summary['score'], summary['score_low'], summary['score_high']))
+	print("Elo difference: %.0f (95%% CI %.0f - %.0f)" % (summary['elo'], summary['elo_low'], summary['elo_high']))
+
+
+if __name__ == "__main__":
+
+	# ----------------------------------------------------
+	# Parsing Console Arguments
+	# ----------------------------------------------------
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-n", "--games", help="Number of games (Default %d)" % (NUM_TESTING * BATCH_SIZE), type=int)
+	parser.add_argument("-w", "--workers", help="Worker processes (Default number of CPUs)", type=int)
+	parser.add_argument("-u", "--hidunits", help="Number of hidden units (Default %d)" % HIDDEN_UNITS, type=int)
+	parser.add_argument("-m", "--maxmoves", help="Maximum moves per game (Default %d)" % MAX_MOVES, type=int)
+	parser.add_argument("-op", "--openings", help="Random opening plies (Default %d)" % OPENING_PLIES, type=int)
+	parser.add_argument("-o", "--opponent", help="Opponent: random, a checkpoint path or an exported .npz (Default random)", type=str)
+	parser.add_argument("-dp", "--depth", help="Alpha-beta depth for model moves, 0 for one-ply greedy (Default 0)", type=int)
+	parser.add_argument("-mc", "--simulations", help="MCTS simulations for model moves, 0 to disable (Default 0)", type=int)
+	parser.add_argument("-cn", "--canonical", help="Models were trained in canonical mode? (Default False)", type=bool)
+	parser.add_argument("-s", "--seed", help="Seed of the first game (Default 0)", type=int)
+	parser.add_argument("-v", "--visualize", help="Visualize game board? (Default False)", type=bool)
+	parser.add_argument("-p", "--print", help="Print moves? (Default False)", type=bool)
+	parser.add_argument("-rd", "--rootdir", help="Root directory for project", type=str)
+	parser.add_argument("-ld", "--loaddir", help="Load directory for the model, or an exported .npz", type=str)
+	args = parser.parse_args()
+
+	num_games = args.games if args.games else NUM_TESTING * BATCH_SIZE
+	workers = args.workers if args.workers else os.cpu_count()
+	hidden_units = args.hidunits if args.hidunits else HIDDEN_UNITS
+	max_moves = args.maxmoves if args.maxmoves else MAX_MOVES
+	opening_plies = args.openings if args.openings is not None else OPENING_PLIES
+	opponent = args.opponent if args.opponent else 'random'
+	search_depth = args.depth if args.depth else 0
+	simulations = args.simulations if args.simulations else 0
+	canonical = args.canonical if args.canonical else False
+	seed = args.seed if args.seed else 0
+	visualize = args.visualize if args.visualize else VISUALIZE
+	print_moves = args.print if args.print else PRINT
+
+	# ----------------------------------------------------
+	# Data Paths
+	# ----------------------------------------------------
+	dir_name = args.rootdir if args.rootdir else "D:\\"										# Root directory
+	load_path = args.loaddir if args.loaddir else os.path.join(dir_name, "checkpoints/model")	# Model load path
+	outcome_file = os.path.join(dir_name, "outcomes.txt")										# Outcomes (.txt)
+
+	# ----------------------------------------------------
+	# Play Games
+	# ----------------------------------------------------
+	model_spec = (load_path, hidden_units, search_depth, simulations, canonical)
+	opponent_spec = 'random' if opponent == 'random' else (opponent, hidden_units, search_depth, simulations, canonical)
+	model_spec, opponent_spec = resolve_players(model_spec, opponent_spec)
+	tasks = [(game, seed + game, max_moves, opening_plies, visualize, print_moves, ALGEBRAIC)
+			 for game in range(0, num_games)]
+
+	start_time = t.time()
+	if workers > 1:
+		# TensorFlow sessions do not survive fork, so workers are spawned
+		context = mp.get_context('spawn')
+		pool = context.Pool(workers, initializer=init_worker, initargs=(model_spec, opponent_spec))
+		outcomes = pool.map(play_game, tasks)
+		pool.close()
+		pool.join()
+	else:
+		init_worker(model_spec, opponent_spec)
+		outcomes = [play_game(task) for task in tasks]
+	print("\nPlayed %d games in %.1f seconds" % (num_games, t.time() - start_time))
+
+	report(summarize(outcomes))
 
 	# Write outcomes to file
-	outcomes = np.array(outcomes)
 	with open(outcome_file, 'a') as file_object:
-		np.savetxt(file_object, outcomes)
-
-	# Close the writer
-	# writer.close()
+		np.savetxt(file_object, np.array(outcomes), fmt='%d')
@@ -0,0 +1,245 @@
+#---------------------------------------------
+# Vectorized Lockstep Simulator for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import numpy as np
+import random as r
+import squares as sq
+import symmetry as sym
+import state as s
+
+# B games are held as a (B, 32) int8 array over the playable squares (see squares.py
+# for square numbering) plus a (B,) array for the side to move.
+# Square codes: 0 = empty, 1 = white piece, 2 = white king, -1 = black piece, -2 = black king
+# Side to move: 1 = white, -1 = black
+
+OFF_BOARD_CODE = 127        # Padding value: neither empty nor a piece of either color
+
+# Directions each square code may move in, indexed by code + 2
+ALLOWED = np.array([[1, 1, 1, 1],      # Black king
+                    [0, 0, 1, 1],      # Black piece
+                    [0, 0, 0, 0],      # Empty
+                    [1, 1, 0, 0],      # White piece
+                    [1, 1, 1, 1]],     # White king
+                   dtype=bool)
+
+# Point value of each square code, indexed by code + 2 (white positive)
+VALUES = np.array([-3, -1, 0, 1, 3])
+
+# Square lookup tables as arrays; moves that leave the board index the padding column
+FILES = np.array(sq.FILES)
+RANKS = np.array(sq.RANKS)
+NEIGHBOURS = np.array(sq.NEIGHBOURS)
+JUMPS = np.array(sq.JUMPS)
+
+# Position of each square's plane-0 entry in the flattened 8 x 8 x 2 board state
+FEATURE_INDEX = ((FILES - 1) * 8 + (RANKS - 1)) * 2
+
+
+def from_pieces(piece_list):
+    """Converting a piece list to a row of square codes"""
+
+    # Args: (1) piece list
+    # Returns: (32,) int8 array of square codes
+
+    squares = np.zeros(32, dtype=np.int8)
+    for piece in piece_list:
+        if piece.is_active:
+            code = 2 if piece.name == 'King' else 1
+            if piece.color == 'black':
+                code = -code
+            squares[sq.square_index(piece.file, piece.rank)] = code
+
+    return squares
+
+
+def initialize(batch_size, random=False, keep_prob=1.0):
+    """Initializing a batch of games"""
+
+    # Args: (1) number of games, (2) random: whether boards are randomized, (3) keep_prob
+    # Returns: (1) (B, 32) square codes, (2) (B,) side to move
+
+    # Boards and first players are drawn exactly as main.initialize_board does
+    squares = np.zeros((batch_size, 32), dtype=np.int8)
+    player = np.ones(batch_size, dtype=np.int8)
+    for game in range(0, batch_size):
+        squares[game] = from_pieces(s.initialize_pieces(random=random, keep_prob=keep_prob))
+        if random and r.randint(0, 1) == 0:
+            player[game] = -1
+
+    return squares, player
+
+
+def legal_moves(squares, player):
+    """Determining available moves for every game"""
+
+    # Args: (1) (B, 32) square codes, (2) (B,) side to move
+    # Returns: (B, 32, 8) boolean array of moves by origin square
+    # Slot d (0-3) is a step in squares.DIRECTIONS[d] and slot 4 + d is a jump in that direction
+
+    # Pad with an off-board column so moves that leave the board index a blocked square
+    padding = np.full((len(squares), 1), OFF_BOARD_CODE, dtype=np.int8)
+    padded = np.concatenate([squares, padding], axis=1)
+
+    own = np.sign(squares) == player[:, None]
+    allowed = ALLOWED[squares + 2] & own[:, :, None]
+
+    ahead = padded[:, NEIGHBOURS]
+    beyond = padded[:, JUMPS]
+    # Relative code of the square ahead: 1 or 2 if it holds an opponent piece
+    relative = ahead.astype(np.int16) * -player[:, None, None]
+    opponent = (relative > 0) & (relative < 3)
+
+    steps = allowed & (ahead == 0)
+    jumps = allowed & opponent & (beyond == 0)
+
+    return np.concatenate([steps, jumps], axis=2)
+
+
+def apply_moves(squares, games, origins, slots):
+    """Performing one move in each of the given games"""
+
+    # Args: (1) (B, 32) square codes, (2) game, (3) origin square and (4) slot of each move
+    # Returns: (K, 32) square codes after each move
+
+    after = squares[games].copy()
+    k = np.arange(len(games))
+    direction = slots % 4
+    jump = slots >= 4
+    targets = np.where(jump, JUMPS[origins, direction], NEIGHBOURS[origins, direction])
+
+    # Lift the moving piece and remove any jumped piece
+    moving = after[k, origins]
+    after[k, origins] = 0
+    after[k[jump], NEIGHBOURS[origins[jump], direction[jump]]] = 0
+
+    # Promote pieces reaching the far rank
+    moving = np.where((moving == 1) & (RANKS[targets] == 8), 2, moving)
+    moving = np.where((moving == -1) & (RANKS[targets] == 1), -2, moving)
+    after[k, targets] = moving
+
+    return after
+
+
+def board_states(squares):
+    """Configuring inputs for value function network"""
+
+    # Args: (1) (N, 32) square codes
+    # Returns: (N, 128) array matching np.reshape(state.board_state(...), 128)
+
+    features = np.zeros((len(squares), 128))
+    rows, columns = np.nonzero(squares > 0)
+    features[rows, FEATURE_INDEX[columns]] = 1
+    rows, columns = np.nonzero(squares < 0)
+    features[rows, FEATURE_INDEX[columns] + 1] = 1
+
+    return features
+
+
+def points(squares):
+    """Calculating point differential for each game"""
+
+    # Args: (1) (N, 32) square codes
+    # Returns: (N,) differentials (white points - black points)
+    return VALUES[squares + 2].sum(axis=1)
+
+
+def generate_game(batch_size, max_moves, epsilon, predict, all_positions=False, canonical=False):
+    """
+    Generating feature and target batches
+    Returns: (1) feature batch, (2) label batch
+    """
+
+    # Plays all batch_size games in lockstep with the same epsilon-greedy policy and
+    # return definition as main.generate_game. Every game advances one ply per loop, so
+    # a single counter serves as the move counter of all games still running.
+    # Args: predict maps an (N, 128) array of board states to (N, 1) expected returns
+    #       all_positions returns every visited state instead of the initial states
+    #       canonical flips states and afterstates with black to move and negates their values
+
+    squares, player = initialize(batch_size, random=True, keep_prob=0.8)
+    initial_states = board_states(squares)
+    initial_player = player.copy()
+    initial_points = points(squares)
+    last_points = initial_points.copy()
+    running = np.ones(batch_size, dtype=bool)
+
+    # Visited states with their game and point differential, for all_positions
+    all_states = []
+    all_games = []
+    all_points = []
+    all_players = []
+
+    for move in range(0, max_moves):
+
+        # Games where either side has no pieces are over
+        running &= np.any(squares > 0, axis=1) & np.any(squares < 0, axis=1)
+        if not running.any():
+            break
+
+        # Points of the current position count toward the return of every earlier state
+        last_points[running] = points(squares[running])
+        if all_positions:
+            all_games.append(np.flatnonzero(running))
+            all_states.append(board_states(squares[running]))
+            all_points.append(last_points[running])
+            all_players.append(player[running])
+
+        # Obtain action space; games with no moves available are over
+        legal = legal_moves(squares, player)
+        legal[~running] = False
+        running &= legal.any(axis=(1, 2))
+        if not running.any():
+            break
+
+        # Score the afterstates of every pending move of every game in one call
+        games, origins, slots = np.nonzero(legal)
+        after = apply_moves(squares, games, origins, slots)
+        if canonical:
+            # Afterstates have the opponent of the mover to move
+            values = sym.evaluate(predict, board_states(after), player[games] == 1)[:, 0]
+        else:
+            values = predict(board_states(after))[:, 0]
+
+        # Moves are grouped by game in np.nonzero order
+        starts = np.flatnonzero(np.r_[True, games[1:] != games[:-1]])
+        counts = np.diff(np.r_[starts, len(games)])
+        group = np.repeat(np.arange(len(starts)), counts)
+
+        # Greedy choice: white maximizes and black minimizes the expected return
+        scores = values * player[games]
+        best = np.flatnonzero(scores == np.repeat(np.maximum.reduceat(scores, starts), counts))
+        first = np.unique(group[best], return_index=True)[1]
+        choice = best[first]
+
+        # With probability epsilon, choose a random move instead
+        explore = np.random.random(len(starts)) < epsilon
+        random_choice = starts + (np.random.random(len(starts)) * counts).astype(int)
+        choice = np.where(explore, random_choice, choice)
+
+        # Perform moves and update players
+        movers = games[starts]
+        squares[movers] = after[choice]
+        player[movers] = -player[movers]
+
+    # Return features and labels
+    if all_positions:
+        all_games = np.concatenate(all_games)
+        feature_batches = np.concatenate(all_states)
+        label_batches = last_points[all_games] - np.concatenate(all_points)
+        players = np.concatenate(all_players)
+    else:
+        feature_batches = initial_states
+        label_batches = last_points - initial_points
+        players = initial_player
+
+    # Store states with black to move from black's point of view
+    if canonical:
+        feature_batches = sym.canonical_states(feature_batches, players == -1)
+        label_batches = label_batches * players
+
+    feature_batches = np.reshape(feature_batches, (-1, 8, 8, 2))
+    return feature_batches, label_batches
@@ -0,0 +1,154 @@
+#---------------------------------------------
+# Zobrist Hashing and Prediction Cache for Checkers AI
+# Created By: Adam Labiosa
+# Inspration From: Jonathan Zia
+# Last Edited: 2021
+# University of Wisconsin - Madison
+# ----------------------------------------------------
+import random as r
+import collections
+import squares as sq
+
+# A position's hash is the XOR of one random 64-bit key per occupied square and piece kind.
+# Moving, capturing or promoting a piece XORs its old key out and its new key in, so the hash
+# can be kept up to date with a couple of operations per move (see Piece.place).
+# The hash covers exactly what state.board_state encodes plus kings, so positions with the
+# same hash have the same network input.
+# The hash of the colour-flipped position (see symmetry.py) is kept alongside: turning the
+# board 180 degrees maps square n to 31 - n, and swapping colours maps kind k to k ^ 2.
+
+# Piece kinds
+WHITE_PIECE = 0
+WHITE_KING = 1
+BLACK_PIECE = 2
+BLACK_KING = 3
+
+
+def build_keys(seed=0):
+    """Building the table of random keys"""
+
+    # Args: (1) seed, fixed so hashes are the same in every process
+    # Returns: 32 x 4 nested list of 64-bit keys
+    generator = r.Random(seed)
+    return [[generator.getrandbits(64) for kind in range(0, 4)] for square in range(0, 32)]
+
+
+KEYS = build_keys()
+
+
+def piece_key(piece):
+    """Looking up the key of a piece on its current square"""
+
+    # Args: (1) piece
+    # Returns: 64-bit key
+    kind = WHITE_PIECE if piece.color == 'white' else BLACK_PIECE
+    if piece.name == 'King':
+        kind += 1
+    return KEYS[sq.square_index(piece.file, piece.rank)][kind]
+
+
+def flipped_key(piece):
+    """Looking up the key of a piece in the colour-flipped position"""
+
+    # Args: (1) piece
+    # Returns: 64-bit key
+    kind = BLACK_PIECE if piece.color == 'white' else WHITE_PIECE
+    if piece.name == 'King':
+        kind += 1
+    return KEYS[31 - sq.square_index(piece.file, piece.rank)][kind]
+
+
+def hash_pieces(piece_list, flipped=False):
+    """Hashing a position from scratch"""
+
+    # Args: (1) piece list, (2) hash the colour-flipped position instead?
+    # Returns: 64-bit hash
+    lookup = flipped_key if flipped else piece_key
+    key = 0
+    for piece in piece_list:
+        if piece.is_active:
+            key ^= lookup(piece)
+    return key
+
+
+class Key():
+
+    """Position hash shared by the pieces of one piece list"""
+
+    __slots__ = ['value', 'flipped']
+
+    def __init__(self, value, flipped):
+        self.value = value
+        self.flipped = flipped      # Hash of the colour-flipped position
+
+
+def attach_key(piece_list):
+    """Attaching a hash that pieces keep up to date"""
+
+    # Args: (1) piece list
+    # Returns: Key shared by all pieces
+
+    # Like state.attach_board, positions edited directly must be attached again.
+    key = Key(hash_pieces(piece_list), hash_pieces(piece_list, flipped=True))
+    for piece in piece_list:
+        piece.key = key
+    return key
+
+
+class PredictionCache():
+
+    """Bounded LRU cache from position hash to predicted value"""
+
+    def __init__(self, capacity):
+
+        # Args: (1) maximum number of entries
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+
+    def get(self, key):
+
+        """Looking up a prediction"""
+
+        # Requires: position hash
+        # Returns: cached value, or None on a miss
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+
+    def put(self, key, value):
+
+        """Storing a prediction, evicting the least recently used entry when full"""
+
+        # Requires: (1) position hash, (2) value
+        # Returns: void
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+
+    def clear(self):
+
+        """Invalidating every prediction (after the weights change)"""
+
+        # Requires: none
+        # Returns: void
+        self.entries.clear()
+
+
+    def hit_rate(self):
+
+        """Fraction of lookups answered from the cache"""
+
+        # Requires: none
+        # Returns: hit rate (0 if there were no lookups)
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0